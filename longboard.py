@@ -1,5 +1,7 @@
 import ezui
-import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from mojo.events import postEvent
 
 from mojo.events import (
@@ -18,7 +20,34 @@ from mojo.subscriber import (
 )
 
 from pprint import pprint
-from fontTools.pens.basePen import BasePen
+
+# the geometry lives in longboardCore, it does not need RoboFont
+from longboardCore import (
+    pipelineTimer,
+    sessionRecorder,
+    SourceLocationIndex,
+    GlyphInterpolationModel,
+    interpolationService,
+    makeSweepLocations,
+    measurementSweep,
+    writeMeasurementSweep,
+    checkInterpolationReadiness,
+    writeInterpolationReadiness,
+    SublayerPool,
+    LevelOfDetail,
+    ModelDiskCache,
+    PreviewRenderer,
+    makeOverlayColors,
+    markerSize,
+    measurementStrokeWidth,
+    vectorStrokeDash,
+)
+
+try:
+    from PyObjCTools.AppHelper import callAfter, callLater
+except ImportError:
+    callAfter = None
+    callLater = None
 
 
 
@@ -33,53 +62,110 @@ toolID = "com.letterror.longboard"
 containerKey = toolID + ".layer"
 settingsChangedEventKey = toolID + "settingsChanged.event"
 operatorChangedEventKey = toolID + "operatorChanged.event"
+timingUpdatedEventKey = toolID + "timingUpdated.event"
 #print('eventKey', eventKey)
 
 interactionSourcesLibKey = toolID + ".interactionSources"
 
+# the compiled models are kept here between sessions, see ModelDiskCache
+modelCacheDirectory = os.path.join(os.path.expanduser("~"), "Library", "Caches", "com.letterror.longboard", "models")
+modelCacheMaxBytes = 512 * 1024 * 1024
+
+# navigator drag events are coalesced and handled at most once per display frame
+navigatorFrameInterval = 1/60
+
 defaultStrokeWidth = 1
 
 
 
 
-class CollectorPen(BasePen):
-    def __init__(self, glyphSet, path=None):
-        self.offset = 0,0
-        self.onCurves = []
-        self.offCurves = []
-        self.startPoints = []
-        self._pointIndex = 0
-        #self.tag = "untagged"
-        BasePen.__init__(self, glyphSet)
-    def setOffset(self, x=0,y=0):
-        self.offset = x, y
-    def _moveTo(self, pos):
-        self.onCurves.append((pos[0]+self.offset[0], pos[1]+self.offset[1]))
-        self.startPoints.append(self._pointIndex)
-        self._pointIndex += 1
-    def _lineTo(self, pos):
-        self.onCurves.append((pos[0]+self.offset[0], pos[1]+self.offset[1]))
-        self._pointIndex += 1
-    def _curveToOne(self, a, b, c):
-        self.offCurves.append((a[0]+self.offset[0], a[1]+self.offset[1]))
-        self.offCurves.append((b[0]+self.offset[0], b[1]+self.offset[1]))
-        self.onCurves.append((c[0]+self.offset[0], c[1]+self.offset[1]))
-        self._pointIndex += 3
-    def _closePath(self):
-        pass
-        
 def getLocationsForFont(font, doc):
     # theoretically, a single UFO can be a source in different discrete locations
-    discreteLocations = [] 
-    continuousLocations = []
-    for s in doc.sources:
-        if s.path == font.path:
-            cl, dl = doc.splitLocation(s.location)
-            if dl is not None:
-                discreteLocations.append(dl)
-            if cl is not None:
-                continuousLocations.append(cl)
-    return continuousLocations, discreteLocations
+    with pipelineTimer.span("getLocationsForFont"):
+        return designspaceRegistry.locationIndex(doc).getLocationsForPath(font.path)
+
+
+class DesignspaceRegistry:
+    # Map font paths to the designspace operator the font is a source in.
+    # The map is rebuilt from AllDesignspaces() only after a designspace was opened,
+    # closed or had its sources changed, so finding the relevant operator for a font
+    # is a dict lookup. If a font is used in more than one designspace, the first wins,
+    # just like AllDesignspaces(usingFont=font)[0].
+    # A miss rebuilds the map once: the invalidating events are missed when no glyph editor
+    # is open, and a font saved under a new path is not in the map. A path that missed is
+    # remembered and answers None from then on, without looking at AllDesignspaces(),
+    # until a designspace is opened, closed or has its sources changed.
+    # It also keeps the SourceLocationIndex for each operator.
+    def __init__(self):
+        self._operators = None
+        self._missed = set()
+        self._indexes = {}
+
+    def invalidate(self):
+        self._operators = None
+        self._missed = set()
+        self._indexes = {}
+
+    def invalidateLocationIndex(self, operator=None):
+        if operator is None:
+            self._indexes = {}
+        else:
+            self._indexes.pop(id(operator), None)
+
+    def locationIndex(self, operator):
+        # the operator is kept with its index so the id can not be reused
+        stored = self._indexes.get(id(operator))
+        if stored is None or stored[0] is not operator:
+            stored = self._indexes[id(operator)] = operator, SourceLocationIndex(operator)
+        return stored[1]
+
+    def _rebuild(self):
+        self._operators = {}
+        for operator in AllDesignspaces():
+            for source in operator.sources:
+                if source.path is not None:
+                    self._operators.setdefault(source.path, operator)
+
+    def operatorForFont(self, font):
+        if font is None or font.path is None:
+            return None
+        if font.path in self._missed:
+            return None
+        rebuilt = self._operators is None
+        if rebuilt:
+            self._rebuild()
+        operator = self._operators.get(font.path)
+        if operator is None and not rebuilt:
+            self._rebuild()
+            operator = self._operators.get(font.path)
+        if operator is None:
+            self._missed.add(font.path)
+        return operator
+
+designspaceRegistry = DesignspaceRegistry()
+
+
+def getGlyphBeams(glyph):
+    # the measurements of the glyph as ((x1, y1), (x2, y2)) beams
+    return [(tuple(m.startPoint), tuple(m.endPoint)) for m in glyph.measurements if m.startPoint is not None and m.endPoint is not None]
+
+
+def recordGlyph(glyph):
+    # what the replay needs to draw this glyph: its name, its font and its measurements
+    if glyph is None or not sessionRecorder.enabled:
+        return
+    beams = getGlyphBeams(glyph)
+    font = glyph.font
+    sessionRecorder.record("glyph",
+        glyphName=glyph.name,
+        fontPath=font.path if font is not None else None,
+        beams=beams,
+    )
+
+
+def getAxisExtremesForOperator(ds):
+    # {axisName: (minimum, default, maximum)} for the continuous axes, in designspace coordinates
+    return designspaceRegistry.locationIndex(ds).getAxisExtremes()
 
 
 items = [
@@ -118,6 +204,18 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
         [X] Show Off Curves @showOffCurveVectors
         [X] Show Measurements @showMeasurements
         [X] Center Preview @centerPreview
+        Preview Text
+        [_ _] @previewText
+
+        Measurements
+        (Sweep Measurements) @sweepMeasurementsButton
+        (Check Interpolation Readiness) @readinessButton
+
+        Timing
+        [ ] Record Timing @recordTiming
+        (Save Trace) @saveTraceButton
+        Not recording @timingSummary
+        [ ] Record Session @recordSession
 
         Transparency
         --X-- Haziness @hazeSlider
@@ -161,6 +259,7 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
             size=(300, "auto")
         )
         self.operator = None
+        self.navigatorEventStats = dict(received=0, handled=0, merged=0)
 
     def tableEditCallback(self, sender):
         # callback for the interaction sources table
@@ -186,11 +285,23 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
         
     def started(self):
         self.w.open()
+        registerLongboardSubscriberEvents()
         registerGlyphEditorSubscriber(LongboardEditorView)
 
     def destroy(self):
+        sessionRecorder.stop()
         unregisterGlyphEditorSubscriber(LongboardEditorView)
 
+    # the controller is running when no glyph editor is open, keep the designspace registry up to date
+    def designspaceEditorDidOpenDesignspace(self, info):
+        designspaceRegistry.invalidate()
+
+    def designspaceEditorDidCloseDesignspace(self, info):
+        designspaceRegistry.invalidate()
+
+    def designspaceEditorSourcesDidChange(self, info):
+        designspaceRegistry.invalidate()
+
     def navigatorLocationChanged(self, info):
         # @@ receive notifications about the navigator location changing.
         # scale mouse movement to "increment units"
@@ -199,9 +310,16 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
         # designspace has axes 
         
         # [{'textValue': 'width', 'popUpValue': 1}, {'textValue': 'weight', 'popUpValue': 0}]
-        view = info["lowLevelEvents"][0].get('view')
+        # The drag events are coalesced over one frame, see navigatorFrameInterval.
+        # The data is measured from the start of the drag, so the latest event wins.
+        # Every event used to be one increment step, so the steps of the merged events are added up.
+        lowLevelEvents = info["lowLevelEvents"]
+        self.navigatorEventStats['received'] += len(lowLevelEvents)
+        self.navigatorEventStats['handled'] += 1
+        self.navigatorEventStats['merged'] += len(lowLevelEvents) - 1
+        view = lowLevelEvents[-1].get('view')
         popOptions = ['horizontal', 'vertical', None]
-        data = info["lowLevelEvents"][0].get('data')
+        data = lowLevelEvents[-1].get('data')
         nav = data['horizontal'], data['vertical']
         #pprint(info)
         offset = view.offset()
@@ -210,17 +328,34 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
         #print('scale', viewScale)
 
         unit = {}
+        steps = {}
         unitScale = 500
         for axis in self.w.getItem("table").get():
             name = axis['textValue']
             if axis['popUpValue'] == 0:     # horizontal
-                unit[name] = (data['horizontal'] / viewScale)/unitScale
+                direction = 'horizontal'
             elif axis['popUpValue'] == 1:     # vertical
-                unit[name] = (data['vertical'] / viewScale)/unitScale
-            # and for ignore we don't pass anything
+                direction = 'vertical'
+            else:
+                # and for ignore we don't pass anything
+                continue
+            unit[name] = (data[direction] / viewScale)/unitScale
+            steps[name] = 0
+            for lowLevelEvent in lowLevelEvents:
+                change = lowLevelEvent['data'][direction]
+                if change < 0:
+                    steps[name] -= 1
+                elif change > 0:
+                    steps[name] += 1
+        sessionRecorder.record("navigator", data=data, unit=unit, steps=steps)
         if unit:
-            postEvent(navigatorUnitChangedEventKey, unit=unit)
+            postEvent(navigatorUnitChangedEventKey, unit=unit, steps=steps, merged=len(lowLevelEvents)-1)
             #print("posting navigatorUnitChangedEventKey", unit)
+
+    def navigatorCoalescingReport(self):
+        # how many navigator events were merged before they were handled
+        stats = self.navigatorEventStats
+        return f"navigator events: {stats['received']} received, {stats['handled']} handled, {stats['merged']} merged"
         
     def relevantOperatorChanged(self, info):
         # @@ from https://robofont.com/documentation/reference/api/mojo/mojo-subscriber/#mojo.subscriber.registerSubscriberEvent
@@ -260,121 +395,249 @@ class LongBoardUIController(Subscriber, ezui.WindowController):
             self.w.getItem("table").set(items)
             self.operator = operator
 
+    def sweepMeasurementsButtonCallback(self, sender):
+        # measure the current glyph on a grid over the continuous axes
+        # and write the distances to a csv next to the designspace
+        glyph = CurrentGlyph()
+        ds = self.operator
+        if glyph is None or ds is None:
+            print("sweepMeasurements: no glyph or no designspace")
+            return
+        beams = getGlyphBeams(glyph)
+        if not beams:
+            print("sweepMeasurements: no measurements in", glyph.name)
+            return
+        cl, dl = getLocationsForFont(glyph.font, ds)
+        discreteLocation = None
+        if dl:
+            discreteLocation = dl[0]
+        items, unicodes = ds.collectSourcesForGlyph(glyphName=glyph.name, decomposeComponents=True, discreteLocation=discreteLocation)
+        axisExtremes = getAxisExtremesForOperator(ds)
+        model = GlyphInterpolationModel.fromSourceItems(items, axisExtremes)
+        if model is None:
+            print("sweepMeasurements: sources for", glyph.name, "are not compatible")
+            return
+        rows = measurementSweep(model, beams, makeSweepLocations(axisExtremes), centerOnWidth=glyph.width)
+        path = os.path.splitext(ds.path)[0] + f"_{glyph.name}_measurements.csv"
+        writeMeasurementSweep(rows, path)
+        print("sweepMeasurements: wrote", path)
+
+    def readinessButtonCallback(self, sender):
+        # compare the structure of every glyph in all sources of the current discrete location
+        # and write the glyphs that are not ready for interpolation to a csv next to the designspace
+        ds = self.operator
+        font = CurrentFont()
+        if ds is None or font is None:
+            print("checkInterpolationReadiness: no font or no designspace")
+            return
+        cl, dl = getLocationsForFont(font, ds)
+        discreteLocation = None
+        if dl:
+            discreteLocation = dl[0]
+        glyphNames = set()
+        for source in ds.findSourceDescriptorsForDiscreteLocation(discreteLocation) if discreteLocation else ds.sources:
+            sourceFont = ds.fonts.get(source.name)
+            if sourceFont is not None:
+                glyphNames.update(sourceFont.keys())
+        rows = checkInterpolationReadiness(interpolationService.signatures, ds, sorted(glyphNames), discreteLocation)
+        path = os.path.splitext(ds.path)[0] + "_readiness.csv"
+        writeInterpolationReadiness([row for row in rows if row[1] != "ready"], path)
+        ready = sum(1 for row in rows if row[1] == "ready")
+        print(f"checkInterpolationReadiness: {ready} of {len(rows)} glyphs ready, wrote", path)
+
+    def recordTimingCallback(self, sender):
+        pipelineTimer.enabled = bool(sender.get())
+        pipelineTimer.clear()
+        self.navigatorEventStats = dict(received=0, handled=0, merged=0)
+        if not pipelineTimer.enabled:
+            self.w.getItem("timingSummary").set("Not recording")
+
+    def timingUpdated(self, info):
+        # the editor views post this after a redraw, coalesced, while timing is recorded
+        if pipelineTimer.enabled:
+            self.w.getItem("timingSummary").set(pipelineTimer.summaryText() + "\n" + self.navigatorCoalescingReport())
+
+    def saveTraceButtonCallback(self, sender):
+        from vanilla.dialogs import putFile
+        path = putFile(messageText="Save the Longboard timing trace", fileName="longboardTrace.json", fileTypes=["json"])
+        if path:
+            pipelineTimer.writeChromeTrace(path)
+            print("saved trace", path)
+
+    def recordSessionCallback(self, sender):
+        # write the navigator drags, settings, preview locations and glyphs to a file
+        # for longboardReplay.py, see SessionRecorder
+        if not sender.get():
+            sessionRecorder.stop()
+            print("stopped recording", sessionRecorder.path)
+            return
+        from vanilla.dialogs import putFile
+        path = putFile(messageText="Record the Longboard session", fileName="longboardSession.jsonl", fileTypes=["jsonl"])
+        if not path:
+            sender.set(False)
+            return
+        ds = self.operator
+        sessionRecorder.start(path, ds.path if ds is not None else None)
+        settings = {key: self.w.getItem(key).get() for key in previewSettingKeys if key != "hazeValue"}
+        settings['hazeValue'] = self.w.getItem("hazeSlider").get()
+        sessionRecorder.record("settings", **settings)
+        recordGlyph(CurrentGlyph())
+        if ds is not None and ds.getPreviewLocation() is not None:
+            sessionRecorder.record("previewLocation", location=ds.getPreviewLocation())
+        print("recording session", path)
+
+    def postSettings(self, **settings):
+        sessionRecorder.record("settings", **settings)
+        postEvent(settingsChangedEventKey, **settings)
+
     def fillInteractionSourcesList(self, ds=None):
         print("fillInteractionSourcesList")
         
     def showPreviewCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, showPreview=value)
+        self.postSettings(showPreview=value)
 
     def showSourcesCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, showSources=value)
+        self.postSettings(showSources=value)
 
     def centerPreviewCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, centerPreview=value)
+        self.postSettings(centerPreview=value)
 
     def showOnCurveVectorsCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, showOnCurveVectors=value)
+        self.postSettings(showOnCurveVectors=value)
 
     def showOffCurveVectorsCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, showOffCurveVectors=value)
+        self.postSettings(showOffCurveVectors=value)
 
     def showMeasurementsCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, showMeasurements=value)
+        self.postSettings(showMeasurements=value)
     
+    def previewTextCallback(self, sender):
+        value = sender.get()
+        self.postSettings(previewText=value)
+
     def useDiscreteLocationOfCurrentFontCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, useDiscreteLocationOfCurrentFont=value)
+        self.postSettings(useDiscreteLocationOfCurrentFont=value)
 
     def hazeSliderCallback(self, sender):
         value = sender.get()
-        postEvent(settingsChangedEventKey, hazeValue=value)
+        self.postSettings(hazeValue=value)
 
 
 class LongboardEditorView(Subscriber):
 
     debug = True
     hazeValue = 0.16
-    
-    def setPreferences(self):
-        self.sourceStrokeColor = (0,0,1, self.hazeValue)
-        self.previewStrokeColor = (0,0,0, self.hazeValue)
-        self.previewFillColor = (.8,.8,.8, self.hazeValue)
-        self.vectorStrokeColor = (0,0,1, self.hazeValue)
-        self.measurementStrokeColor = (.5,0,1, self.hazeValue)
-        self.measurementMarkerSize = 6
-        self.measurementStrokeWidth = 5
-        self.measurementFillColor = (.5,0,1, self.hazeValue)
-        self.vectorStrokeDash = (5, 5)
-        self.markerSize = 5
-        self.previewMarkerSize = 6
-        self.measureLineCurveOffset = 70
+    batchRendering = True     # draw vectors, markers and jumpers in single layers
+    prefetchSteps = 8         # number of navigator increments to calculate ahead
+    asyncRendering = True     # make the preview geometry outside the main thread
+    diskCaching = True        # keep the compiled models on disk, see ModelDiskCache
+    dragFrameBudget = 1/60    # seconds for a frame while the navigator drags, see LevelOfDetail
+    dragIdleDelay = .25       # seconds without a drag step before the full detail is drawn
+    dragMarkerStep = 2        # draw every nth preview marker while dragging, 0 for none
+    # the render nodes that are drawn while dragging, for each level of detail.
+    # the others are hidden when their inputs change, and drawn again after the drag.
+    dragDetailLevels = LevelOfDetail.defaultLevels
     
     def build(self):
-        self.setPreferences()
         self.currentOperator = None
-        self.showPreview = True
-        self.showSources = True
-        self.centerAllGlyphs = True
-        self.showOnCurveVectors = True
-        self.showOffCurveVectors = True
-        self.showMarkers = True
-        self.showMeasurements = True
         self.useDiscreteLocationOfCurrentFont = True
-
         self.previewLocation = None
+        # level of detail while the navigator drags
+        self.dragging = False
+        self.dragIdle = False
+        self.dragIdleToken = 0
 
+        colors = makeOverlayColors(self.hazeValue)
         glyphEditor = self.getGlyphEditor()
         self.container = glyphEditor.extensionContainer(containerKey)
         self.previewPathLayer = self.container.appendPathSublayer(
-            strokeColor=self.previewStrokeColor,
+            strokeColor=colors['previewStrokeColor'],
             strokeWidth=1,
-            fillColor = self.previewFillColor
+            fillColor = colors['previewFillColor']
         )
         self.sourcesPathLayer = self.container.appendPathSublayer(
-            strokeColor=self.sourceStrokeColor,
+            strokeColor=colors['sourceStrokeColor'],
             strokeWidth=1,
             fillColor = None
         )
         self.sourcesVectorsLayer = self.container.appendLineSublayer(
-            strokeColor=self.vectorStrokeColor,
+            strokeColor=colors['vectorStrokeColor'],
             strokeWidth=1,
             fillColor = None,
-            strokeDash=self.vectorStrokeDash,
+            strokeDash=vectorStrokeDash,
         )
         self.markersLayer = self.container.appendSymbolSublayer(
-            fillColor = self.sourceStrokeColor,
+            fillColor = colors['sourceStrokeColor'],
         )
         self.markersLayer.setImageSettings(
             dict(
                 name="rectangle",
-                size=(self.markerSize, self.markerSize),
-                fillColor=self.sourceStrokeColor
+                size=(markerSize, markerSize),
+                fillColor=colors['sourceStrokeColor']
             )
         )
         self.measurementsIntersectionsLayer = self.container.appendLineSublayer(
-            strokeColor=self.measurementStrokeColor,
-            strokeWidth=self.measurementStrokeWidth,
+            strokeColor=colors['measurementStrokeColor'],
+            strokeWidth=measurementStrokeWidth,
             fillColor = None,
-            #strokeDash=self.vectorStrokeDash,
+            #strokeDash=vectorStrokeDash,
         )
         self.measurementMarkerLayer = self.container.appendSymbolSublayer(
         )
         self.measurementMarkerLayer.setImageSettings(
             dict(
                 name="rectangle",
-                size=(self.markerSize, self.markerSize),
-                fillColor=self.measurementStrokeColor
+                size=(markerSize, markerSize),
+                fillColor=colors['measurementStrokeColor']
             )
         )
         self.measurementTextLayer = self.container.appendBaseSublayer()
+        self.previewLineLayer = self.container.appendBaseSublayer()
+        # the pools reuse the sublayers of these containers between redraws
+        pools = dict(
+            preview=SublayerPool(self.previewPathLayer),
+            sources=SublayerPool(self.sourcesPathLayer),
+            onCurveVectors=SublayerPool(self.sourcesVectorsLayer),
+            offCurveVectors=SublayerPool(self.sourcesVectorsLayer),
+            previewMarkers=SublayerPool(self.markersLayer),
+            sourceMarkers=SublayerPool(self.markersLayer),
+            measurementJumpers=SublayerPool(self.measurementsIntersectionsLayer),
+            measurementMarkers=SublayerPool(self.measurementMarkerLayer),
+            measurementText=SublayerPool(self.measurementTextLayer),
+            previewLine=SublayerPool(self.previewLineLayer),
+        )
+        # the overlays are made by the same renderer as in the session replay
+        self.renderer = PreviewRenderer(interpolationService, pools,
+            hazeValue=self.hazeValue,
+            batchRendering=self.batchRendering,
+            detailLevels=self.dragDetailLevels,
+            frameBudget=self.dragFrameBudget,
+            dragMarkerStep=self.dragMarkerStep)
+        # the interpolations are shared with the other glyph editors
+        interpolationService.register(self.renderer)
+        if self.diskCaching and interpolationService.diskCache is None:
+            interpolationService.diskCache = ModelDiskCache(modelCacheDirectory, modelCacheMaxBytes)
+        # the geometry is made in a render thread, the main thread only applies it.
+        # every request gets a new generation, older results are discarded.
+        self.renderExecutor = None
+        if self.asyncRendering and callAfter is not None:
+            self.renderExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="longboardRender")
+        self.computeGeneration = 0
+        self.renderFuture = None
+        self.pendingInputs = None
 
     def relevantForThisEditor(self, info=None):
+        with pipelineTimer.span("relevantForThisEditor"):
+            return self.findRelevantOperator(info)
+
+    def findRelevantOperator(self, info=None):
         # check if the current font belongs to the current designspace.
         #    glyphEditorDidSetGlyph {'subscriberEventName': 'glyphEditorDidSetGlyph', 'lowLevelEvents': [{'view': <DoodleGlyphView: 0x7fa11b4f8c20>, 'glyph': <RGlyph 'O' ('foreground') at 140332211638384>, 'notificationName': 'viewDidChangeGlyph', 'tool': <lib.eventTools.editingTool.EditingTool object at 0x7fa1a0940fd0>}], 'iterations': [{'glyph': <RGlyph 'O' ('foreground') at 140332211638384>, 'glyphEditor': <lib.doodleGlyphWindow.DoodleGlyphWindow object at 0x7fa1a1f7a3d0>, 'locationInGlyph': None, 'deviceState': None, 'NSEvent': None}], 'glyph': <RGlyph 'O' ('foreground') at 140332211638384>, 'glyphEditor': <lib.doodleGlyphWindow.DoodleGlyphWindow object at 0x7fa1a1f7a3d0>, 'locationInGlyph': None, 'deviceState': None, 'NSEvent': None}
         font = None
@@ -385,41 +648,117 @@ class LongboardEditorView(Subscriber):
             glyphFromNotification = info.get('glyph')
             if glyphFromNotification is not None:
                 font = glyphFromNotification.font
-                allSpaces = AllDesignspaces(usingFont=font)
-                if len(allSpaces)>=1:
-                    self.operator = allSpaces[0]
+                operator = designspaceRegistry.operatorForFont(font)
+                if operator is not None:
+                    self.operator = operator
                     postEvent(operatorChangedEventKey, operator=self.operator)
                     #print("relevantForThisEditor -> found space from info")
-                    return True, font, allSpaces[0]
+                    return True, font, operator
         # try to find it from the currentfont
         font = CurrentFont()
-        allSpaces = AllDesignspaces(usingFont=font)
+        operator = designspaceRegistry.operatorForFont(font)
         #print("relevantForThisEditor -> trying to find space from font")
-        if len(allSpaces)>=1:
-            self.operator = allSpaces[0]
-            return True, font, allSpaces[0]
+        if operator is not None:
+            self.operator = operator
+            return True, font, operator
         return False, font, None
+
+    # keep the designspace registry up to date
+    def designspaceEditorDidOpenDesignspace(self, info):
+        designspaceRegistry.invalidate()
+
+    def designspaceEditorDidCloseDesignspace(self, info):
+        designspaceRegistry.invalidate()
+        operator = info.get('designspace')
+        if operator is None:
+            interpolationService.clear()
+        else:
+            interpolationService.operatorClosed(operator)
+        self.renderer.generation += 1
+
+    def designspaceEditorSourcesDidChange(self, info):
+        designspaceRegistry.invalidate()
+        interpolationService.clear()
+        self.renderer.generation += 1
+
+    def designspaceEditorAxesDidChange(self, info):
+        designspaceRegistry.invalidateLocationIndex(info.get('designspace'))
+        # compiled models are normalized with the old axes
+        interpolationService.clear()
+        self.renderer.generation += 1
     
     def getAxisIncrementUnit(self, axisName):
-        # calculate our preferred smallest step along this axis
-        axisSteps = 500     # emprically established constant, from skateboard
-        minimum, default, maximum = self.operator.getAxisExtremes(self.operator.getAxis(axisName))
-        return (maximum - minimum)/axisSteps
+        # our preferred smallest step along this axis, see axisIncrementSteps
+        return designspaceRegistry.locationIndex(self.operator).getAxisIncrementUnit(axisName)
 
     def navigatorUnitChanged(self, info):
         #print("navigatorUnitChanged", info)
-        unit = info['lowLevelEvents'][0]['unit']
+        unit = info['lowLevelEvents'][-1]['unit']
+        # number of increments per axis, the navigator adds up coalesced drag events
+        steps = info['lowLevelEvents'][-1].get('steps', {})
         glyphEditor = self.getGlyphEditor()
         previewLocation = self.operator.getPreviewLocation()
+        increments = {}
         #print('before unit change', previewLocation )
         for axisName, change in unit.items():
             unit = self.getAxisIncrementUnit(axisName)
-            if change < 0:
+            if axisName in steps:
+                change = steps[axisName]
+                previewLocation[axisName] = previewLocation[axisName] + steps[axisName] * unit
+            elif change < 0:
                 previewLocation[axisName] = previewLocation[axisName] - unit
             elif change > 0:
                 previewLocation[axisName] = previewLocation[axisName] + unit
+            if change < 0:
+                increments[axisName] = -unit
+            elif change > 0:
+                increments[axisName] = unit
         #print('after unit change', previewLocation )
+        self.dragDidStep()
         self.operator.setPreviewLocation(previewLocation)
+        if increments:
+            self.prefetchPreviewLocations(previewLocation, increments)
+
+    def navigatorActive(self, info):
+        # the navigator starts a drag: draw less until it stops
+        sessionRecorder.record("navigatorActive")
+        self.dragging = True
+        self.dragIdle = False
+        self.renderer.detail.reset()
+
+    def navigatorInactive(self, info):
+        # the drag is over, one redraw with all the detail
+        sessionRecorder.record("navigatorInactive")
+        self.dragging = False
+        self.dragIdle = False
+        self.dragIdleToken += 1
+        self.updateOutline()
+
+    def dragDidStep(self):
+        # when the navigator holds still for dragIdleDelay the full detail is drawn
+        self.dragIdle = False
+        self.dragIdleToken += 1
+        if callLater is not None:
+            callLater(self.dragIdleDelay, self.dragDidIdle, self.dragIdleToken)
+
+    def dragDidIdle(self, token):
+        if token != self.dragIdleToken or not self.dragging:
+            return
+        self.dragIdle = True
+        self.updateOutline()
+
+    def isReducingDetail(self):
+        return self.dragging and not self.dragIdle
+
+    def prefetchPreviewLocations(self, previewLocation, increments):
+        # calculate the next few steps in the direction of the drag, see PreviewPrefetcher
+        editorGlyph = self.getGlyphEditor().getGlyph()
+        if editorGlyph is None:
+            return
+        continuousLocation, discreteLocation = self.getCurrentSourceLocations(editorGlyph, self.operator)
+        model = interpolationService.getInterpolationModel(self.operator, editorGlyph.name, discreteLocation, designspaceRegistry.locationIndex(self.operator))
+        if model is not None and interpolationService.prefetcher is not None:
+            interpolationService.prefetcher.prefetch(model, previewLocation, increments, count=self.prefetchSteps)
         
     def updatePreviewLocation(self, newLocation):
         self.previewLocation = newLocation
@@ -427,6 +766,10 @@ class LongboardEditorView(Subscriber):
         
     def destroy(self):
         self.currentOperator = None
+        self.cancelRender()
+        if self.renderExecutor is not None:
+            self.renderExecutor.shutdown(wait=False, cancel_futures=True)
+        interpolationService.unregister(self.renderer)
         glyphEditor = self.getGlyphEditor()
         container = glyphEditor.extensionContainer(containerKey)
         container.clearSublayers()
@@ -435,6 +778,7 @@ class LongboardEditorView(Subscriber):
         relevant, font, ds = self.relevantForThisEditor(info)
         if not relevant:
             return
+        recordGlyph(self.getGlyphEditor().getGlyph())
         #ds = CurrentDesignspace()
         ds = self.operator
         previewLocation = ds.getPreviewLocation()
@@ -458,10 +802,28 @@ class LongboardEditorView(Subscriber):
             ds.setPreviewLocation(previewContinuous)
             self.updateOutline()
 
+    def invalidateGlyph(self, info):
+        # drop the cached interpolations for the glyph in this notification
+        # and for the composites that use it
+        glyph = info.get('glyph')
+        self.renderer.generation += 1
+        if glyph is None:
+            interpolationService.clear()
+        else:
+            names = interpolationService.glyphChanged(glyph.name, glyph.font.path if glyph.font is not None else None)
+            if self.operator is not None:
+                # the operator only knows about the glyph itself
+                for name in names - {glyph.name}:
+                    self.operator.glyphChanged(name)
+
     def designspaceEditorSourceGlyphDidChange(self, info):
+        self.invalidateGlyph(info)
         relevant, font, ds = self.relevantForThisEditor(info)
         if not relevant:
             return
+        glyph = info.get('glyph')
+        if glyph is not None:
+            sessionRecorder.record("sourceGlyphChanged", glyphName=glyph.name)
         self.updateOutline()
 
     def designspaceEditorPreviewLocationDidChange(self, info):
@@ -469,290 +831,206 @@ class LongboardEditorView(Subscriber):
         if not relevant:
             return
         self.previewLocation = info['location']
+        sessionRecorder.record("previewLocation", location=self.previewLocation)
         self.updateOutline()
     
     def glyphDidChangeMeasurements(self, info):
+        # the outlines did not change, the measurements node has the beams in its inputs
         relevant, font, ds = self.relevantForThisEditor(info)
         if not relevant:
             return
+        recordGlyph(self.getGlyphEditor().getGlyph())
         self.updateOutline()
     
-    def drawMeasurements(self, editorGlyph, previewShift, previewGlyph):
-        # draw intersections for the current measuring beam and the current preview
-        for m in editorGlyph.measurements:
-            if m.startPoint is None or m.endPoint is None:
-                continue
-            x1, y1 = m.startPoint
-            x2, y2 = m.endPoint
-            beamData = ((x1,y1),(x2,y2))
-            r = previewGlyph.getRepresentation("doodle.Beam", 
-                beam=beamData, 
-                canHaveComponent=False, 
-                italicAngle=editorGlyph.font.info.italicAngle)
-            r.intersects.sort()
-            for i, mp in enumerate(r.intersects):
-                if i == len(r.intersects)-1:
-                    break
-                mp1 = r.intersects[i]
-                mp2 = r.intersects[(i+1)]
-                measureLineAngle = math.atan2(mp1[1]-mp2[1], mp1[0]-mp2[0]) - .5*math.pi
-                # draw the jumper curve
-                bcp1 = mp1[0]
-                jumperLayer = self.measurementsIntersectionsLayer.appendPathSublayer(
-                    strokeWidth=self.measurementStrokeWidth,
-                    strokeColor=self.measurementStrokeColor,
-                    fillColor=None,
-                )
-                needlex = math.cos(measureLineAngle) * self.measureLineCurveOffset
-                needley = math.sin(measureLineAngle) * self.measureLineCurveOffset
-                jumperPen = jumperLayer.getPen(clear=True)
-                jumperPen.moveTo(mp1)
-                jumperPen.curveTo((mp1[0]+needlex, mp1[1]+needley), (mp2[0]+needlex, mp2[1]+needley), (mp2[0], mp2[1]))
-                jumperPen.endPath()
-                # draw the end markers
-                symbolLayer = self.measurementMarkerLayer.appendSymbolSublayer(position=mp1)
-                symbolLayer.setImageSettings(
-                    dict(
-                        name="oval",
-                        size=(self.measurementMarkerSize, self.measurementMarkerSize),
-                        fillColor=self.measurementFillColor
-                        )
-                    )
-                symbolLayer = self.measurementMarkerLayer.appendSymbolSublayer(position=mp2)
-                symbolLayer.setImageSettings(
-                    dict(
-                        name="oval",
-                        size=(self.measurementMarkerSize, self.measurementMarkerSize),
-                        fillColor=self.measurementFillColor
-                        )
-                    )
-                # draw the measurement distance text
-                textPos = .5*(mp1[0]+mp2[0])+needlex, .5*(mp1[1]+mp2[1])+needley
-                dist = math.hypot(mp1[0]-mp2[0], mp1[1]-mp2[1])
-                textLayer= self.measurementTextLayer.appendTextLineSublayer(
-                    position=textPos,
-                    pointSize=10,
-                    fillColor=(1,1,1,1),
-                    backgroundColor=self.measurementFillColor,
-                    horizontalAlignment="center",
-                    cornerRadius=6,
-                    padding=(3, 1)
-                    )
-                textLayer.setText(f"{dist:3.2f}")
-        
+    def getCurrentSourceLocations(self, editorGlyph, ds):
+        # # boldly assume a font is only in a single discrete location
+        with pipelineTimer.span("getLocationsForFont"):
+            return designspaceRegistry.locationIndex(ds).getSourceLocations(editorGlyph.font.path)
+
     def updateOutline(self):
-        self.previewPathLayer.clearSublayers()
-        self.sourcesPathLayer.clearSublayers()
-        self.sourcesVectorsLayer.clearSublayers()
-        self.markersLayer.clearSublayers()
-        self.measurementMarkerLayer.clearSublayers()
-        self.measurementsIntersectionsLayer.clearSublayers()
-        self.measurementTextLayer.clearSublayers()
-        
-        if self.operator is None:
+        # only the render nodes with changed inputs are redrawn,
+        # their layers from the previous redraw are reused.
+        with pipelineTimer.span("updateOutline"):
+            self.drawOutline()
+
+    def drawOutline(self):
+        # The work is done in three steps:
+        # prepareRender on the main thread collects what needs the fonts and the operator,
+        # PreviewRenderer.compute makes the geometry, in the render thread if there is one,
+        # applyRender puts the finished data in the layers, on the main thread.
+        request = self.prepareRender()
+        if request is None:
+            self.cancelRender()
+            self.renderer.hide()
+            return
+        if not request['dirty']:
+            return
+        if self.renderExecutor is None:
+            self.applyRender(request, self.renderer.compute(request))
             return
+        if self.pendingInputs == request['inputs']:
+            # the same picture is already on its way
+            return
+        self.cancelRender()
+        self.computeGeneration += 1
+        request['generation'] = self.computeGeneration
+        self.pendingInputs = request['inputs']
+        self.renderFuture = self.renderExecutor.submit(self.renderer.compute, request)
+        self.renderFuture.add_done_callback(lambda future: callAfter(self.renderDidFinish, request, future))
+
+    def cancelRender(self):
+        # the result of the render in progress is no longer needed
+        self.computeGeneration += 1
+        self.pendingInputs = None
+        if self.renderFuture is not None:
+            self.renderFuture.cancel()
+            self.renderFuture = None
+
+    def renderDidFinish(self, request, future):
+        # back on the main thread
+        if future.cancelled() or request['generation'] != self.computeGeneration:
+            # a newer preview location arrived in the meantime
+            return
+        self.renderFuture = None
+        self.pendingInputs = None
+        error = future.exception()
+        if error is not None:
+            for name in request['dirty']:
+                self.renderer.nodes[name].invalidate()
+            raise error
+        self.applyRender(request, future.result())
+
+    def prepareRender(self):
+        # main thread: the editor glyph, the locations and everything that comes from the operator
+        if self.operator is None or self.previewLocation is None:
+            return None
         ds = self.operator
         editorGlyph = self.getGlyphEditor().getGlyph()
-        #if glyph.width != self.centeredWidth:
-        #    self.centeredWidth = glyph.width
-        #    ds.glyphChanged(glyph.name)
-        cpCurrent = CollectorPen(glyphSet=editorGlyph.font)
-        sourcePens = []
-        editorGlyph.draw(cpCurrent)
-        if self.previewLocation is None:
-            return
-            
-        # # boldly assume a font is only in a single discrete location
-        cl, dl = getLocationsForFont(editorGlyph.font, ds)
-        continuousLocationForCurrentSource = {}
-        discreteLocationForCurrentSource = {}
-        if cl:
-            if cl[0] is not None:
-                continuousLocationForCurrentSource = cl[0]
-        if dl:
-            if dl[0] is not None:
-                discreteLocationForCurrentSource = dl[0]
+        if editorGlyph is None:
+            return None
+        return self.renderer.prepare(ds, designspaceRegistry.locationIndex(ds), editorGlyph, self.previewLocation,
+            beams=getGlyphBeams(editorGlyph),
+            reducingDetail=self.isReducingDetail())
+
+    def applyRender(self, request, result):
+        # main thread: put the finished geometry in the layers of the dirty render nodes
+        self.renderer.apply(request, result)
+        if pipelineTimer.enabled:
+            postEvent(timingUpdatedEventKey)
 
-        if self.previewLocation is not None:
-            mathGlyph = ds.makeOneGlyph(editorGlyph.name, location=self.previewLocation)
-            if editorGlyph is None or mathGlyph is None:
-                path = None
-            else:
-                previewGlyph = RGlyph()
-                mathGlyph.extractGlyph(previewGlyph.asDefcon())
-                shift = 0
-                if self.centerAllGlyphs:
-                    xMin, yMin, xMax, yMax = previewGlyph.bounds
-                    shift = .5*editorGlyph.width-.5*previewGlyph.width
-                    previewGlyph.moveBy((shift, 0))
-                cpPreview = CollectorPen(glyphSet={})
-                previewGlyph.draw(cpPreview)
-                if self.showMeasurements:
-                    self.drawMeasurements(editorGlyph,  shift, previewGlyph)
-                if self.showPreview==1:
-                    path = previewGlyph.getRepresentation("merz.CGPath")
-                    layer = self.previewPathLayer.appendPathSublayer(
-                        fillColor = self.previewFillColor,
-                        strokeColor=self.previewStrokeColor,
-                        strokeWidth=1)
-                    layer.setPath(path)
-                    # draw the preview markers
-                    for m in cpPreview.onCurves:
-                        symbolLayer = self.markersLayer.appendSymbolSublayer(position=m)
-                        symbolLayer.setImageSettings(
-                            dict(
-                                name="oval",
-                                size=(self.previewMarkerSize, self.previewMarkerSize),
-                                fillColor=self.previewStrokeColor
-                                )
-                            )
-
-        if self.showSources or self.showOnCurveVectors:
-            items, unicodes = ds.collectSourcesForGlyph(glyphName=editorGlyph.name, decomposeComponents=True, discreteLocation=discreteLocationForCurrentSource)
-            for item in items:
-                loc, srcMath, thing = item
-                sourcePen = CollectorPen(glyphSet={})
-                # do not draw the master we're drawing in
-                # 
-                if loc==continuousLocationForCurrentSource: continue
-                srcGlyph = RGlyph()
-                srcMath.extractGlyph(srcGlyph.asDefcon())
-                if self.centerAllGlyphs:
-                    xMin, yMin, xMax, yMax = srcGlyph.bounds
-                    shift = .5*editorGlyph.width-.5*srcGlyph.width
-                    srcGlyph.moveBy((shift, 0))
-                srcGlyph.draw(sourcePen)
-                sourcePens.append(sourcePen)
-                if self.showSources:
-                    path = srcGlyph.getRepresentation("merz.CGPath")
-                    layer = self.sourcesPathLayer.appendPathSublayer(
-                        fillColor=None,
-                        strokeColor=self.sourceStrokeColor,
-                        strokeWidth=1)
-                    layer.setPath(path)
-            if self.showOnCurveVectors:
-                for s in sourcePens:
-                    for a, b in zip(cpCurrent.onCurves, s.onCurves):
-                        lineLayer = self.sourcesVectorsLayer.appendLineSublayer(
-                            startPoint=a,
-                            endPoint=b,
-                            strokeWidth=1,
-                            strokeColor=self.vectorStrokeColor,
-                            strokeDash=self.vectorStrokeDash,
-                        )
-                        if self.showMarkers:
-                            symbolLayer = self.markersLayer.appendSymbolSublayer(position=b)
-                            symbolLayer.setImageSettings(
-                                dict(
-                                    name="oval",
-                                    size=(self.markerSize, self.markerSize),
-                                    fillColor=self.sourceStrokeColor
-                                    )
-                                )
-            if self.showOffCurveVectors:
-                for s in sourcePens:
-                    for a, b in zip(cpCurrent.offCurves, s.offCurves):
-                        lineLayer = self.sourcesVectorsLayer.appendLineSublayer(
-                            startPoint=a,
-                            endPoint=b,
-                            strokeWidth=1,
-                            strokeColor=self.vectorStrokeColor,
-                            strokeDash=self.vectorStrokeDash,
-                        )
-                        if self.showMarkers:
-                            symbolLayer = self.markersLayer.appendSymbolSublayer(position=b)
-                            symbolLayer.setImageSettings(
-                                dict(
-                                    name="oval",
-                                    size=(self.markerSize, self.markerSize),
-                                    fillColor=self.sourceStrokeColor
-                                    )
-                                )
-                
     def showSettingsChanged(self, info):
-        if info["showPreview"] is not None:
-            self.showPreview = info["showPreview"]
-        if info["showSources"] is not None:
-            self.showSources = info["showSources"]
-        if info["centerPreview"] is not None:
-            self.centerAllGlyphs = info["centerPreview"]
-        if info["showOnCurveVectors"] is not None:
-            self.showOnCurveVectors = info["showOnCurveVectors"]
-        if info["showOffCurveVectors"] is not None:
-            self.showOffCurveVectors = info["showOffCurveVectors"]
-        if info["showMeasurements"] is not None:
-            self.showMeasurements = info["showMeasurements"]
-        if info["useDiscreteLocationOfCurrentFont"] is not None:
-            self.useDiscreteLocationOfCurrentFont = info["useDiscreteLocationOfCurrentFont"]
-        if info["hazeValue"] is not None:
-            self.hazeValue = info["hazeValue"]
-            self.setPreferences()
-        self.updateOutline()
-
-
-def previewSettingsExtractor(subscriber, info):
-    # crikey there as to be a more efficient way to do this.
-    info["showPreview"] = None
-    info["showSources"] = None
-    info["centerPreview"] = None
-    info["showOnCurveVectors"] = None
-    info["showOffCurveVectors"] = None
-    info["showMeasurements"] = None
-    info["useDiscreteLocationOfCurrentFont"] = None
-    info["hazeValue"] = None
-    for lowLevelEvent in info["lowLevelEvents"]:
-        info["showPreview"] = lowLevelEvent.get("showPreview")
-        info["showSources"] = lowLevelEvent.get("showSources")
-        info["centerPreview"] = lowLevelEvent.get("centerPreview")
-        info["showOnCurveVectors"] = lowLevelEvent.get("showOnCurveVectors")
-        info["showOffCurveVectors"] = lowLevelEvent.get("showOffCurveVectors")
-        info["showMeasurements"] = lowLevelEvent.get("showMeasurements")
-        info["useDiscreteLocationOfCurrentFont"] = lowLevelEvent.get("useDiscreteLocationOfCurrentFont")
-        info["hazeValue"] = lowLevelEvent.get("hazeValue")
-
-
-# 
-registerSubscriberEvent(
-    subscriberEventName=settingsChangedEventKey,
-    methodName="showSettingsChanged",
-    lowLevelEventNames=[settingsChangedEventKey],
-    eventInfoExtractionFunction=previewSettingsExtractor,
-    dispatcher="roboFont",
-    delay=0,
-    debug=True
-)
+        settings = info["settings"]
+        if "useDiscreteLocationOfCurrentFont" in settings:
+            self.useDiscreteLocationOfCurrentFont = settings["useDiscreteLocationOfCurrentFont"]
+        # the render nodes figure out which overlays changed
+        if self.renderer.changeSettings(settings):
+            self.updateOutline()
 
-# The concept of "relevant" operator:
-# it is the operator that belongs to the font that belongs to the glyph that is in the editor.
-registerSubscriberEvent(
-    subscriberEventName=operatorChangedEventKey,
-    methodName="relevantOperatorChanged",
-    lowLevelEventNames=[operatorChangedEventKey],
-    dispatcher="roboFont",
-    delay=0.01,
-    documentation="This is sent when the glyph editor subscriber finds there is a new relevant designspace.",
-    debug=True
-)
 
-registerSubscriberEvent(
-    subscriberEventName=navigatorLocationChangedEventKey,
-    methodName="navigatorLocationChanged",
-    lowLevelEventNames=[navigatorLocationChangedEventKey],
-    dispatcher="roboFont",
-    delay=0,
-    documentation="Posted by the Longboard Navigator Tool to the LongBoardUIController",
-    debug=True
+# settings posted by the LongBoardUIController, see PreviewRenderer.changeSettings
+previewSettingKeys = (
+    "showPreview",
+    "showSources",
+    "centerPreview",
+    "showOnCurveVectors",
+    "showOffCurveVectors",
+    "showMeasurements",
+    "useDiscreteLocationOfCurrentFont",
+    "previewText",
+    "hazeValue",
 )
 
-registerSubscriberEvent(
-    subscriberEventName=navigatorUnitChangedEventKey,
-    methodName="navigatorUnitChanged",
-    lowLevelEventNames=[navigatorUnitChangedEventKey],
-    dispatcher="roboFont",
-    delay=0,
-    documentation="Posted by the LongBoardUIController to the previewer",
-    debug=True
-)
+def previewSettingsExtractor(subscriber, info):
+    # only pass on the settings that were in the coalesced events, latest value wins
+    settings = {}
+    for lowLevelEvent in info["lowLevelEvents"]:
+        for key in previewSettingKeys:
+            if lowLevelEvent.get(key) is not None:
+                settings[key] = lowLevelEvent[key]
+    info["settings"] = settings
+
+
+_subscriberEventsRegistered = False
+
+def registerLongboardSubscriberEvents():
+    # Register the longboard events with mojo, once.
+    # This is not done on import, so importing longboard has no side effects.
+    # Call it before the subscribers that use these events are made.
+    global _subscriberEventsRegistered
+    if _subscriberEventsRegistered:
+        return
+    _subscriberEventsRegistered = True
+    registerSubscriberEvent(
+        subscriberEventName=settingsChangedEventKey,
+        methodName="showSettingsChanged",
+        lowLevelEventNames=[settingsChangedEventKey],
+        eventInfoExtractionFunction=previewSettingsExtractor,
+        dispatcher="roboFont",
+        delay=0,
+        debug=True
+    )
+
+    # The concept of "relevant" operator:
+    # it is the operator that belongs to the font that belongs to the glyph that is in the editor.
+    registerSubscriberEvent(
+        subscriberEventName=operatorChangedEventKey,
+        methodName="relevantOperatorChanged",
+        lowLevelEventNames=[operatorChangedEventKey],
+        dispatcher="roboFont",
+        delay=0.01,
+        documentation="This is sent when the glyph editor subscriber finds there is a new relevant designspace.",
+        debug=True
+    )
+
+    registerSubscriberEvent(
+        subscriberEventName=timingUpdatedEventKey,
+        methodName="timingUpdated",
+        lowLevelEventNames=[timingUpdatedEventKey],
+        dispatcher="roboFont",
+        delay=0.5,
+        documentation="Posted by the glyph editor subscriber after a redraw while timing is recorded.",
+        debug=True
+    )
+
+    registerSubscriberEvent(
+        subscriberEventName=navigatorLocationChangedEventKey,
+        methodName="navigatorLocationChanged",
+        lowLevelEventNames=[navigatorLocationChangedEventKey],
+        dispatcher="roboFont",
+        delay=navigatorFrameInterval,
+        documentation="Posted by the Longboard Navigator Tool to the LongBoardUIController",
+        debug=True
+    )
+
+    registerSubscriberEvent(
+        subscriberEventName=navigatorActiveEventKey,
+        methodName="navigatorActive",
+        lowLevelEventNames=[navigatorActiveEventKey],
+        dispatcher="roboFont",
+        delay=0,
+        documentation="Posted by the Longboard Navigator Tool when a drag starts",
+        debug=True
+    )
+
+    registerSubscriberEvent(
+        subscriberEventName=navigatorInactiveEventKey,
+        methodName="navigatorInactive",
+        lowLevelEventNames=[navigatorInactiveEventKey],
+        dispatcher="roboFont",
+        delay=0,
+        documentation="Posted by the Longboard Navigator Tool when a drag ends",
+        debug=True
+    )
+
+    registerSubscriberEvent(
+        subscriberEventName=navigatorUnitChangedEventKey,
+        methodName="navigatorUnitChanged",
+        lowLevelEventNames=[navigatorUnitChangedEventKey],
+        dispatcher="roboFont",
+        delay=0,
+        documentation="Posted by the LongBoardUIController to the previewer",
+        debug=True
+    )
 
 
 
@@ -775,9 +1053,11 @@ class LongboardNavigatorTool(Subscriber, BaseEventTool):
     def mouseDown(self, point, event):
         if self.start is None:
             self.start = point.x, point.y
+        publishEvent(navigatorActiveEventKey)
 
     def mouseUp(self, event):
         self.start = None
+        publishEvent(navigatorInactiveEventKey)
 
     def mouseDragged(self, point=None, delta=None):
         self.didDrag = True
@@ -791,7 +1071,7 @@ class LongboardNavigatorTool(Subscriber, BaseEventTool):
         return "Longboard Navigator"
 
 if __name__ == "__main__":
-    import time
+    registerLongboardSubscriberEvents()
     nt = LongboardNavigatorTool()
     installTool(nt)
     print(time.time(),"refreshed navigator")
@@ -0,0 +1,324 @@
+# Headless benchmarks for the Longboard preview pipeline.
+#
+# This runs the work updateOutline does for a redraw, without RoboFont:
+# compiling the interpolation model, making the instance, collecting points,
+# centering, the source overlay, batched layer construction and measurements.
+# The designspaces are synthetic, made with fontTools designspaceLib and
+# parameterised by axis count, source count, contour count and point count.
+# It also measures how long a cold import of longboardCore takes.
+#
+#   python longboardBenchmark.py --output results.json
+#   python longboardBenchmark.py --output new.json --compare results.json
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+
+from fontTools.designspaceLib import DesignSpaceDocument
+from fontMath.mathGlyph import MathGlyph
+
+# the preview geometry, it does not need RoboFont
+import longboardCore
+
+
+# synthetic designspaces
+
+class SyntheticGlyph:
+    # just enough of a glyph for MathGlyph
+    def __init__(self, name, width, contours):
+        self.name = name
+        self.width = width
+        self.height = 0
+        self.unicodes = []
+        self.anchors = []
+        self.guidelines = []
+        self.image = None
+        self.lib = {}
+        self.note = None
+        self.contours = contours
+
+    def drawPoints(self, pointPen):
+        for contour in self.contours:
+            pointPen.beginPath()
+            for pt, segmentType in contour:
+                pointPen.addPoint(pt, segmentType=segmentType)
+            pointPen.endPath()
+
+
+def makeSyntheticContours(contourCount, pointCount, factors):
+    # concentric rings of alternating line and curve segments,
+    # factors distort the rings differently for every source
+    contours = []
+    segments = max(2, pointCount // 3)
+    for c in range(contourCount):
+        radius = 100 + 40 * c
+        cx = 500 + 20 * c * factors[0]
+        contour = []
+        for i in range(segments):
+            a0 = 2 * math.pi * i / segments
+            a1 = 2 * math.pi * (i + 1) / segments
+            rx = radius * factors[0]
+            ry = radius * factors[1 % len(factors)]
+            if i % 2:
+                contour.append(((cx + rx*math.cos(a1), 500 + ry*math.sin(a1)), "line"))
+            else:
+                h0 = a0 + (a1 - a0) / 3
+                h1 = a0 + 2 * (a1 - a0) / 3
+                contour.append(((cx + rx*math.cos(h0), 500 + ry*math.sin(h0)), None))
+                contour.append(((cx + rx*math.cos(h1), 500 + ry*math.sin(h1)), None))
+                contour.append(((cx + rx*math.cos(a1), 500 + ry*math.sin(a1)), "curve"))
+        contours.append(contour)
+    return contours
+
+
+class SyntheticOperator:
+    # stands in for UFOOperator, with the methods the preview pipeline uses
+    def __init__(self, axisCount=2, sourceCount=4, contourCount=4, pointCount=64, seed=1):
+        self.doc = DesignSpaceDocument()
+        self.contourCount = contourCount
+        self.pointCount = pointCount
+        names = [f"axis{i}" for i in range(axisCount)]
+        for name in names:
+            self.doc.addAxisDescriptor(name=name, tag=name[:1] + name[-3:].rjust(3, "0"), minimum=0, default=0, maximum=1000)
+        rng = random.Random(seed)
+        locations = [{name: 0 for name in names}]
+        candidates = []
+        for name in names:
+            candidates.append({**locations[0], name: 1000})
+        for combination in itertools.product([0, 500, 1000], repeat=axisCount):
+            candidates.append(dict(zip(names, combination)))
+        for candidate in candidates:
+            if len(locations) >= sourceCount:
+                break
+            if candidate not in locations:
+                locations.append(candidate)
+        for i, location in enumerate(locations):
+            self.doc.addSourceDescriptor(name=f"source{i}", path=f"/synthetic/source{i}.ufo", location=location)
+        self.factors = {}
+        for source in self.doc.sources:
+            self.factors[source.name] = [1 + rng.uniform(0, .5) * source.location[name] / 1000 for name in names] or [1]
+
+    @property
+    def sources(self):
+        return self.doc.sources
+
+    def splitLocation(self, location):
+        return dict(location), None
+
+    def getOrderedContinuousAxes(self):
+        return self.doc.axes
+
+    def getAxisExtremes(self, axis):
+        return axis.minimum, axis.default, axis.maximum
+
+    def collectSourcesForGlyph(self, glyphName, decomposeComponents=False, discreteLocation=None):
+        items = []
+        for source in self.doc.sources:
+            factors = self.factors[source.name]
+            glyph = SyntheticGlyph(glyphName, 1000 * factors[0], makeSyntheticContours(self.contourCount, self.pointCount, factors))
+            info = dict(source=source.path, glyphName=glyphName, sourceName=source.name)
+            items.append((dict(source.location), MathGlyph(glyph), info))
+        return items, []
+
+    def randomLocation(self, rng):
+        return {axis.name: rng.uniform(axis.minimum, axis.maximum) for axis in self.doc.axes}
+
+
+# the stages of a redraw
+
+lineLength = 20     # glyphs in the preview string stages
+
+def makeStages(operator):
+    items, unicodes = operator.collectSourcesForGlyph("synthetic", decomposeComponents=True)
+    axisExtremes = {axis.name: operator.getAxisExtremes(axis) for axis in operator.getOrderedContinuousAxes()}
+    model = longboardCore.GlyphInterpolationModel.fromSourceItems(items, axisExtremes)
+    location = operator.randomLocation(random.Random(2))
+    coordinates = model.makeInstance(location)
+    editorWidth = items[0][1].width
+    editorPen = longboardCore.ArrayCollectorPen(glyphSet={})
+    items[0][1].draw(editorPen)
+    beams = [((0, 500), (2000, 500)), ((500, -200), (500, 1200)), ((0, 0), (1500, 1000))]
+    state = {}
+
+    def compileModel():
+        longboardCore.GlyphInterpolationModel.fromSourceItems(items, axisExtremes)
+
+    def mathGlyphInterpolation():
+        # the arithmetic makeOneGlyph does, for comparison
+        a = items[0][1]
+        b = items[-1][1]
+        a + (b - a) * .37
+
+    def makeInstance():
+        model.makeInstance(location)
+
+    # a line of glyphs that share the source layout, like a preview string
+    lineModels = {f"glyph{i}": model for i in range(lineLength)}
+
+    def lineOneByOne():
+        for glyphName, lineModel in lineModels.items():
+            lineModel.makeInstance(location)
+
+    def lineBatched():
+        longboardCore.makeInstancesAtLocation(lineModels, location)
+
+    def previewPen():
+        shift = .5*editorWidth - .5*float(model.getWidth(coordinates))
+        state['previewPen'] = model.makePen(coordinates, shift=(shift, 0))
+
+    def sourcePens():
+        pens = []
+        for loc, srcMath, info in items[1:]:
+            pens.append(longboardCore.makeOutlinePen(srcMath, shift=(.5*editorWidth - .5*srcMath.width, 0)))
+        state['sourcePens'] = pens
+
+    def vectorPairing():
+        onCurveVectors, offCurveVectors = longboardCore.pairVectors(editorPen, state['sourcePens'])
+        state['vectors'] = onCurveVectors + offCurveVectors
+
+    def batchedLayers():
+        container = longboardCore.CountingContainer()
+        vectors = state['vectors']
+        longboardCore.appendVectorsLayer(container, vectors, strokeColor=(0, 0, 1, 1), strokeWidth=1, strokeDash=(5, 5))
+        longboardCore.appendMarkersLayer(container, [b for a, b in vectors], size=5, fillColor=(0, 0, 1, 1))
+        state['layerCount'] = container.layerCount
+
+    def measurements():
+        longboardCore.measureBeams(beams, state['previewPen'])
+
+    return [
+        ("compileModel", compileModel),
+        ("mathGlyphInterpolation", mathGlyphInterpolation),
+        ("makeInstance", makeInstance),
+        ("lineOneByOne", lineOneByOne),
+        ("lineBatched", lineBatched),
+        ("previewPen", previewPen),
+        ("sourcePens", sourcePens),
+        ("vectorPairing", vectorPairing),
+        ("batchedLayers", batchedLayers),
+        ("measurements", measurements),
+    ], state
+
+
+def timeStage(function, repeat=5):
+    timer = timeit.Timer(function)
+    number, total = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return dict(number=number, min=min(times), median=statistics.median(times))
+
+
+presets = dict(
+    small=dict(axisCount=1, sourceCount=2, contourCount=2, pointCount=16),
+    medium=dict(axisCount=2, sourceCount=4, contourCount=4, pointCount=64),
+    large=dict(axisCount=3, sourceCount=8, contourCount=8, pointCount=256),
+)
+
+
+def runBenchmarks(parameterSets, repeat=5, verbose=True):
+    results = []
+    for parameters in parameterSets:
+        operator = SyntheticOperator(**parameters)
+        stages, state = makeStages(operator)
+        for name, function in stages:
+            timing = timeStage(function, repeat=repeat)
+            result = dict(parameters, stage=name, **timing)
+            if name == "batchedLayers":
+                result['layerCount'] = state['layerCount']
+            results.append(result)
+            if verbose:
+                label = " ".join(f"{k}={v}" for k, v in parameters.items())
+                print(f"{label:<60} {name:<24} {timing['median']*1e6:12.1f} us")
+    return results
+
+
+def measureImportTime(moduleName="longboardCore", repeat=5):
+    # median seconds for a cold import of the module, each in a fresh interpreter
+    code = f"import time; t = time.perf_counter(); import {moduleName}; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True).stdout
+        times.append(float(output.strip()))
+    return statistics.median(times)
+
+
+def resultKey(result):
+    return tuple(result.get(k) for k in ("axisCount", "sourceCount", "contourCount", "pointCount", "stage"))
+
+
+def compareResults(results, baseline, threshold=1.25):
+    # return the results that are slower than threshold times the baseline
+    previous = {resultKey(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(resultKey(result))
+        if old is None:
+            continue
+        ratio = result['median'] / old['median'] if old['median'] else 0
+        if ratio > threshold:
+            regressions.append((result, ratio))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Longboard preview pipeline without RoboFont.")
+    parser.add_argument("--preset", choices=sorted(presets), action="append", help="parameter preset, can be repeated. Default: all presets")
+    parser.add_argument("--axes", type=int, help="number of axes")
+    parser.add_argument("--sources", type=int, help="number of sources")
+    parser.add_argument("--contours", type=int, help="number of contours")
+    parser.add_argument("--points", type=int, help="number of points per contour")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timing repeats")
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="compare with the results in this json file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    parser.add_argument("--import-budget", type=float, help="fail if importing longboardCore takes more milliseconds than this")
+    options = parser.parse_args(args)
+
+    if any(v is not None for v in (options.axes, options.sources, options.contours, options.points)):
+        base = presets['medium']
+        parameterSets = [dict(
+            axisCount=options.axes or base['axisCount'],
+            sourceCount=options.sources or base['sourceCount'],
+            contourCount=options.contours or base['contourCount'],
+            pointCount=options.points or base['pointCount'],
+        )]
+    else:
+        parameterSets = [presets[name] for name in (options.preset or sorted(presets, key=lambda n: presets[n]['pointCount']))]
+
+    results = runBenchmarks(parameterSets, repeat=options.repeat)
+    importTime = measureImportTime(repeat=options.repeat)
+    print(f"{'import longboardCore':<85} {importTime*1e6:12.1f} us")
+    data = dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        numpy=longboardCore.getNumpy().__version__ if longboardCore.getNumpy() is not None else None,
+        importTime=importTime,
+        results=results,
+    )
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(data, f, indent=2)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compareResults(results, baseline, options.threshold)
+        for result, ratio in regressions:
+            print(f"regression: {result['stage']} {resultKey(result)[:4]} is {ratio:.2f}x slower")
+        if regressions:
+            return 1
+    if options.import_budget is not None and importTime*1000 > options.import_budget:
+        print(f"regression: importing longboardCore takes {importTime*1000:.1f} ms, the budget is {options.import_budget:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2551 @@
+# The geometry of the Longboard preview, without RoboFont.
+#
+# Pens, location helpers, the compiled interpolation model, the beam
+# measurements, the vector pairing, the caches, the pipeline timer and the
+# renderer that puts the overlays in the layers of a glyph editor.
+# None of this imports ezui, mojo or merz, so it can be imported, timed
+# and run anywhere fontTools and fontMath are installed.
+# numpy is optional and only imported when it is first needed.
+
+import math
+import bisect
+import collections
+import csv
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import plistlib
+import re
+import struct
+import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+
+from fontTools.pens.basePen import BasePen
+from fontTools.pens.pointPen import AbstractPointPen, PointToSegmentPen
+from fontTools.misc.vector import Vector
+from fontTools.misc.transform import Transform, Identity
+from fontMath.mathGlyph import FilterRedundantPointPen, MathGlyphPen
+
+
+axisIncrementSteps = 500     # emprically established constant, from skateboard
+
+_numpy = False
+
+def getNumpy():
+    # numpy if it is installed, otherwise None.
+    # It is imported on first use: it is optional and slow to import.
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+class ArrayCollectorPen(BasePen):
+    # Collects an outline compactly. All points go in one flat array('d') of x, y values
+    # in drawing order. pointTypes has 1 for each on-curve and 0 for each off-curve point,
+    # startPoints has the index of the first point of each contour, closed has 1 for each closed contour.
+    # That is enough to draw the outline again with replay, the pen doubles as the path.
+    def __init__(self, glyphSet=None, path=None):
+        self.coordinates = array('d')
+        self.pointTypes = array('B')
+        self.startPoints = array('l')
+        self.closed = array('B')
+        BasePen.__init__(self, glyphSet)
+
+    def _addPoint(self, pos, pointType):
+        self.coordinates.append(pos[0])
+        self.coordinates.append(pos[1])
+        self.pointTypes.append(pointType)
+
+    def _moveTo(self, pos):
+        self.startPoints.append(len(self.pointTypes))
+        self._addPoint(pos, 1)
+
+    def _lineTo(self, pos):
+        self._addPoint(pos, 1)
+
+    def _curveToOne(self, a, b, c):
+        self._addPoint(a, 0)
+        self._addPoint(b, 0)
+        self._addPoint(c, 1)
+
+    def _closePath(self):
+        self.closed.append(1)
+
+    def _endPath(self):
+        self.closed.append(0)
+
+    def __len__(self):
+        return len(self.pointTypes)
+
+    def replay(self, pen):
+        # draw the collected outline into a segment pen: a merz layer pen, an svg pen
+        c = self.coordinates
+        types = self.pointTypes
+        starts = list(self.startPoints) + [len(types)]
+        for contourIndex in range(len(self.startPoints)):
+            index = starts[contourIndex]
+            end = starts[contourIndex+1]
+            pen.moveTo((c[2*index], c[2*index+1]))
+            index += 1
+            while index < end:
+                if types[index]:
+                    pen.lineTo((c[2*index], c[2*index+1]))
+                    index += 1
+                else:
+                    pen.curveTo((c[2*index], c[2*index+1]), (c[2*index+2], c[2*index+3]), (c[2*index+4], c[2*index+5]))
+                    index += 3
+            if contourIndex < len(self.closed) and not self.closed[contourIndex]:
+                pen.endPath()
+            else:
+                pen.closePath()
+
+    def iterPoints(self, pointType=1):
+        c = self.coordinates
+        for i, t in enumerate(self.pointTypes):
+            if t == pointType:
+                yield c[2*i], c[2*i+1]
+
+    @property
+    def onCurves(self):
+        return list(self.iterPoints(1))
+
+    @property
+    def offCurves(self):
+        return list(self.iterPoints(0))
+
+
+def cubicPoint(p0, p1, p2, p3, t):
+    mt = 1 - t
+    a, b, c, d = mt*mt*mt, 3*mt*mt*t, 3*mt*t*t, t*t*t
+    return (a*p0[0] + b*p1[0] + c*p2[0] + d*p3[0], a*p0[1] + b*p1[1] + c*p2[1] + d*p3[1])
+
+def cubicDerivative(p0, p1, p2, p3, t):
+    mt = 1 - t
+    a, b, c = 3*mt*mt, 6*mt*t, 3*t*t
+    return (a*(p1[0]-p0[0]) + b*(p2[0]-p1[0]) + c*(p3[0]-p2[0]), a*(p1[1]-p0[1]) + b*(p2[1]-p1[1]) + c*(p3[1]-p2[1]))
+
+
+class OutlineSegments:
+    # The outline in an ArrayCollectorPen flattened into a buffer of line segments,
+    # so that all measurement beams can be intersected with it in one pass.
+    # Every curve is split into flattenSteps segments. A hit on one of those is
+    # refined with a few newton steps on the curve itself, so the result is exact
+    # and does not depend on the flattening.
+    # This replaces the doodle.Beam representation, and it does not need RoboFont.
+    newtonSteps = 4
+
+    def __init__(self, pen, flattenSteps=16):
+        self.curves = []
+        # x0, y0, x1, y1, curve index or -1, t0, t1
+        segments = []
+        c = pen.coordinates
+        types = pen.pointTypes
+        starts = list(pen.startPoints) + [len(types)]
+        for contourIndex in range(len(starts)-1):
+            start, end = starts[contourIndex], starts[contourIndex+1]
+            if end - start < 2:
+                continue
+            first = current = (c[2*start], c[2*start+1])
+            i = start + 1
+            while i < end:
+                if types[i] == 1:
+                    pt = (c[2*i], c[2*i+1])
+                    segments.append((current[0], current[1], pt[0], pt[1], -1, 0, 1))
+                    current = pt
+                    i += 1
+                else:
+                    curve = current, (c[2*i], c[2*i+1]), (c[2*i+2], c[2*i+3]), (c[2*i+4], c[2*i+5])
+                    curveIndex = len(self.curves)
+                    self.curves.append(curve)
+                    previous = current
+                    for step in range(1, flattenSteps+1):
+                        t = step / flattenSteps
+                        pt = curve[3] if step == flattenSteps else cubicPoint(*curve, t)
+                        segments.append((previous[0], previous[1], pt[0], pt[1], curveIndex, (step-1)/flattenSteps, t))
+                        previous = pt
+                    current = curve[3]
+                    i += 3
+            if current != first:
+                # close the contour
+                segments.append((current[0], current[1], first[0], first[1], -1, 0, 1))
+        self.segments = segments
+        numpy = getNumpy()
+        if numpy is not None:
+            self.segmentArray = numpy.array(segments, dtype=float).reshape(-1, 7)
+            self.curveArray = numpy.array(self.curves, dtype=float).reshape(-1, 4, 2)
+
+    def intersectBeams(self, beams):
+        # beams: list of ((x1, y1), (x2, y2))
+        # returns one list of intersection points per beam, in order along the beam.
+        # Because the order follows the beam and not the x coordinate, beams drawn
+        # along the italic angle come out right without knowing the angle.
+        if not beams or not self.segments:
+            return [[] for beam in beams]
+        numpy = getNumpy()
+        if numpy is not None:
+            return self._intersectBeamsArray(beams)
+        return [self._intersectBeam(beam) for beam in beams]
+
+    def _refine(self, curve, t, p, d):
+        # newton steps on the distance of the curve to the beam line
+        nx, ny = -d[1], d[0]
+        for i in range(self.newtonSteps):
+            bx, by = cubicPoint(*curve, t)
+            dbx, dby = cubicDerivative(*curve, t)
+            slope = nx*dbx + ny*dby
+            if slope == 0:
+                break
+            t = min(1, max(0, t - (nx*(bx-p[0]) + ny*(by-p[1])) / slope))
+        return cubicPoint(*curve, t)
+
+    def _intersectBeam(self, beam):
+        (px, py), (qx, qy) = beam
+        dx, dy = qx - px, qy - py
+        length = dx*dx + dy*dy
+        if length == 0:
+            return []
+        hits = []
+        for x0, y0, x1, y1, curveIndex, t0, t1 in self.segments:
+            ex, ey = x1 - x0, y1 - y0
+            denom = dx*ey - dy*ex
+            if denom == 0:
+                continue
+            wx, wy = x0 - px, y0 - py
+            u = (wx*ey - wy*ex) / denom
+            v = (wx*dy - wy*dx) / denom
+            if u < 0 or u > 1 or v < 0 or v >= 1:
+                continue
+            if curveIndex < 0:
+                pt = (px + u*dx, py + u*dy)
+            else:
+                pt = self._refine(self.curves[curveIndex], t0 + v*(t1-t0), (px, py), (dx, dy))
+                u = ((pt[0]-px)*dx + (pt[1]-py)*dy) / length
+            hits.append((u, pt))
+        hits.sort()
+        return self._removeDoubles([pt for u, pt in hits])
+
+    def _removeDoubles(self, points, tolerance=1e-6):
+        # a beam through the point where two segments meet can hit both of them
+        unique = []
+        for pt in points:
+            if unique and abs(pt[0]-unique[-1][0]) < tolerance and abs(pt[1]-unique[-1][1]) < tolerance:
+                continue
+            unique.append(pt)
+        return unique
+
+    def _intersectBeamsArray(self, beams):
+        numpy = getNumpy()
+        b = numpy.array(beams, dtype=float).reshape(-1, 4)
+        px, py = b[:, 0:1], b[:, 1:2]
+        dx, dy = b[:, 2:3] - px, b[:, 3:4] - py
+        s = self.segmentArray
+        x0, y0 = s[:, 0], s[:, 1]
+        ex, ey = s[:, 2] - x0, s[:, 3] - y0
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            denom = dx*ey - dy*ex
+            wx, wy = x0 - px, y0 - py
+            u = (wx*ey - wy*ex) / denom
+            v = (wx*dy - wy*dx) / denom
+            mask = (denom != 0) & (u >= 0) & (u <= 1) & (v >= 0) & (v < 1)
+        beamIndex, segmentIndex = numpy.nonzero(mask)
+        u = u[beamIndex, segmentIndex]
+        v = v[beamIndex, segmentIndex]
+        bpx, bpy = px[beamIndex, 0], py[beamIndex, 0]
+        bdx, bdy = dx[beamIndex, 0], dy[beamIndex, 0]
+        hx, hy = bpx + u*bdx, bpy + u*bdy
+        curveIndex = s[segmentIndex, 4].astype(int)
+        onCurve = curveIndex >= 0
+        if onCurve.any():
+            # refine all curve hits at once
+            cp = self.curveArray[curveIndex[onCurve]]
+            t0, t1 = s[segmentIndex[onCurve], 5], s[segmentIndex[onCurve], 6]
+            t = t0 + v[onCurve]*(t1 - t0)
+            nx, ny = -bdy[onCurve], bdx[onCurve]
+            cpx, cpy = bpx[onCurve], bpy[onCurve]
+            for i in range(self.newtonSteps):
+                mt = 1 - t
+                w = numpy.stack([mt*mt*mt, 3*mt*mt*t, 3*mt*t*t, t*t*t], axis=1)
+                pts = numpy.einsum('ij,ijk->ik', w, cp)
+                dw = numpy.stack([3*mt*mt, 6*mt*t, 3*t*t], axis=1)
+                dpts = numpy.einsum('ij,ijk->ik', dw, cp[:, 1:] - cp[:, :-1])
+                slope = nx*dpts[:, 0] + ny*dpts[:, 1]
+                dist = nx*(pts[:, 0]-cpx) + ny*(pts[:, 1]-cpy)
+                safe = slope != 0
+                t = numpy.where(safe, t - dist/numpy.where(safe, slope, 1), t).clip(0, 1)
+            mt = 1 - t
+            w = numpy.stack([mt*mt*mt, 3*mt*mt*t, 3*mt*t*t, t*t*t], axis=1)
+            pts = numpy.einsum('ij,ijk->ik', w, cp)
+            hx[onCurve], hy[onCurve] = pts[:, 0], pts[:, 1]
+            length = bdx[onCurve]**2 + bdy[onCurve]**2
+            u[onCurve] = ((pts[:, 0]-cpx)*bdx[onCurve] + (pts[:, 1]-cpy)*bdy[onCurve]) / length
+        results = [[] for beam in beams]
+        order = numpy.lexsort((u, beamIndex))
+        for i in order:
+            results[beamIndex[i]].append((float(hx[i]), float(hy[i])))
+        return [self._removeDoubles(points) for points in results]
+
+
+class _Span:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.addSpan(self.name, self.start, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_noSpan = _NoSpan()
+
+
+class PipelineTimer:
+    # Optional timing of the stages of a redraw.
+    # with pipelineTimer.span("name"): ... records how long the block took,
+    # count() records a value, like the number of layers a redraw made.
+    # When it is not enabled a span costs next to nothing.
+    # The spans can be summarized for the panel, or written as a Chrome trace
+    # json file that chrome://tracing, Perfetto and speedscope can open.
+    # Spans come from the render thread too, they are read from a copy taken under the lock.
+    def __init__(self, maxEvents=20000):
+        self.enabled = False
+        self.spans = collections.deque(maxlen=maxEvents)
+        self.counters = collections.deque(maxlen=maxEvents)
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return _noSpan
+        return _Span(self, name)
+
+    def addSpan(self, name, start, duration):
+        with self._lock:
+            self.spans.append((name, start, duration, threading.get_ident()))
+
+    def count(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self.counters.append((name, time.perf_counter(), value))
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def _events(self):
+        with self._lock:
+            return list(self.spans), list(self.counters)
+
+    def summary(self):
+        # {name: (calls, mean ms, max ms)} for the spans, and the last value of each counter
+        spanEvents, counterEvents = self._events()
+        durations = {}
+        for name, start, duration, thread in spanEvents:
+            durations.setdefault(name, []).append(duration)
+        spans = {}
+        for name, values in durations.items():
+            spans[name] = len(values), 1000*sum(values)/len(values), 1000*max(values)
+        counters = {}
+        for name, stamp, value in counterEvents:
+            counters[name] = value
+        return spans, counters
+
+    def summaryText(self):
+        spans, counters = self.summary()
+        lines = []
+        for name, (calls, mean, maximum) in sorted(spans.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name}: {mean:.2f} ms (max {maximum:.2f}, {calls}x)")
+        for name, value in counters.items():
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def writeChromeTrace(self, path):
+        spanEvents, counterEvents = self._events()
+        events = []
+        pid = os.getpid()
+        for name, start, duration, thread in spanEvents:
+            events.append(dict(name=name, cat="longboard", ph="X", ts=start*1e6, dur=duration*1e6, pid=pid, tid=thread))
+        for name, stamp, value in counterEvents:
+            events.append(dict(name=name, cat="longboard", ph="C", ts=stamp*1e6, pid=pid, args={name: value}))
+        with open(path, "w") as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit="ms"), f)
+
+pipelineTimer = PipelineTimer()
+
+
+def jsonSafe(value):
+    # locations, beams and settings as json values: tuples become lists, numbers stay numbers
+    if isinstance(value, dict):
+        return {str(k): jsonSafe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonSafe(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class SessionRecorder:
+    # Optional recording of what happens in a session: the navigator drags, the settings,
+    # the preview locations and the glyphs, one json object per line, with the seconds
+    # since the recording started. longboardReplay.py plays it back without RoboFont.
+    # An event that is the same as the one before it is left out, every glyph editor
+    # reports the same preview location.
+    version = 1
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._file = None
+        self._start = None
+        self._last = None
+        self.events = 0
+
+    def start(self, path, designspacePath=None):
+        self.stop()
+        self.path = path
+        self._file = open(path, "w")
+        self._start = time.perf_counter()
+        self._last = None
+        self.events = 0
+        self.enabled = True
+        self.record("session", version=self.version, designspace=designspacePath, started=time.time())
+
+    def record(self, event, **data):
+        if not self.enabled:
+            return
+        data = jsonSafe(data)
+        if (event, data) == self._last:
+            return
+        self._last = event, data
+        line = dict(t=round(time.perf_counter() - self._start, 6), event=event)
+        line.update(data)
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+        self.events += 1
+
+    def stop(self):
+        self.enabled = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def readSession(path):
+    # the events of a recorded session, in order
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+sessionRecorder = SessionRecorder()
+
+
+class SourceLocationIndex:
+    # Everything about the sources and axes of one operator that we need on every redraw:
+    # source path -> the continuous and discrete locations it is used at,
+    # axis name -> the extremes in designspace coordinates and the navigator increment.
+    # Only rebuilt when the sources or axes of the designspace change.
+    def __init__(self, operator):
+        self.locations = {}
+        self.axes = {}
+        for s in operator.sources:
+            continuousLocations, discreteLocations = self.locations.setdefault(s.path, ([], []))
+            cl, dl = operator.splitLocation(s.location)
+            if dl is not None:
+                discreteLocations.append(dl)
+            if cl is not None:
+                continuousLocations.append(cl)
+        for axis in operator.getOrderedContinuousAxes():
+            minimum, default, maximum = operator.getAxisExtremes(axis)
+            self.axes[axis.name] = minimum, default, maximum, (maximum - minimum)/axisIncrementSteps
+
+    def getLocationsForPath(self, path):
+        continuousLocations, discreteLocations = self.locations.get(path, ([], []))
+        return list(continuousLocations), list(discreteLocations)
+
+    def getAxisExtremes(self):
+        # {axisName: (minimum, default, maximum)} for the continuous axes
+        return {name: values[:3] for name, values in self.axes.items()}
+
+    def getAxisIncrementUnit(self, axisName):
+        return self.axes[axisName][3]
+
+    def getSourceLocations(self, path):
+        # the continuous and discrete location of the source with this path
+        # boldly assume a font is only in a single discrete location
+        continuousLocations, discreteLocations = self.locations.get(path, ([], []))
+        continuousLocation = continuousLocations[0] if continuousLocations and continuousLocations[0] is not None else {}
+        discreteLocation = discreteLocations[0] if discreteLocations and discreteLocations[0] is not None else {}
+        return continuousLocation, discreteLocation
+
+
+def locationKey(location):
+    # make a hashable, order independent key from a location dict
+    # anisotropic values are kept as tuples
+    if not location:
+        return ()
+    key = []
+    for name, value in location.items():
+        if isinstance(value, (tuple, list)):
+            value = tuple(round(v, 6) for v in value)
+        elif value is not None:
+            value = round(value, 6)
+        key.append((name, value))
+    key.sort()
+    return tuple(key)
+
+
+class InterpolationCache:
+    # A small LRU cache for the results of makeOneGlyph and collectSourcesForGlyph.
+    # Every key contains the change token of the glyph, so when a source glyph
+    # changes the token is bumped and the old entries can never be served again.
+    # They are dropped right away as well so they don't take up room.
+    def __init__(self, maxSize=256):
+        self.maxSize = maxSize
+        self._items = collections.OrderedDict()
+        self._tokens = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def changeToken(self, glyphName):
+        return self._tokens.get(glyphName, 0)
+
+    def makeKey(self, kind, operator, glyphName, discreteLocation=None, location=None):
+        return (kind, glyphName, id(operator), locationKey(discreteLocation), locationKey(location), self.changeToken(glyphName))
+
+    def get(self, key, default=None):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxSize:
+            self._items.popitem(last=False)
+
+    def glyphChanged(self, glyphName):
+        # only the entries for this glyph are affected
+        self._tokens[glyphName] = self.changeToken(glyphName) + 1
+        for key in [key for key in self._items if key[1] == glyphName]:
+            del self._items[key]
+
+    def operatorClosed(self, operator):
+        # the keys have the id of the operator, a new operator can get the same id
+        for key in [key for key in self._items if key[2] == id(operator)]:
+            del self._items[key]
+
+    def clear(self):
+        self._items.clear()
+
+
+def normalizeLocationForModel(location, axisExtremes):
+    # normalize a designspace location to -1, 0, 1 for the variation model.
+    # values outside the axis are clipped, like makeOneGlyph does.
+    # fontTools.varLib is slow to import, it is only needed once there is something to interpolate
+    from fontTools.varLib.models import normalizeValue
+    normalized = {}
+    for axisName, triple in axisExtremes.items():
+        value = location.get(axisName, triple[1])
+        if isinstance(value, (tuple, list)):
+            # anisotropic locations are left to the operator
+            return None
+        normalized[axisName] = normalizeValue(value, triple)
+    return normalized
+
+
+class StructureCollectorPointPen(AbstractPointPen):
+    # Collect the point structure and a flat list of coordinates.
+    # The structure is a tuple of contours, each a tuple of (segmentType, smooth).
+    def __init__(self):
+        self.contours = []
+        self.coordinates = []
+        self.hasComponents = False
+
+    @property
+    def structure(self):
+        return tuple(tuple(contour) for contour in self.contours)
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.contours.append([])
+
+    def endPath(self):
+        pass
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.contours[-1].append((segmentType, smooth))
+        self.coordinates.append(pt[0])
+        self.coordinates.append(pt[1])
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.hasComponents = True
+
+
+class GlyphInterpolationModel:
+    # A compiled interpolation model for a single glyph.
+    # The point coordinates and the advance width of each source are flattened
+    # into a single vector, and turned into a delta matrix once. After that an
+    # instance is one product of the scalars for the location and the deltas.
+    # Uses numpy if it is available, fontTools Vector otherwise.
+    def __init__(self, structure, model, deltas, axisExtremes):
+        self.structure = structure
+        self.model = model
+        self.deltas = deltas
+        self.axisExtremes = axisExtremes
+        self.penLayout = PenLayout.fromStructure(structure)
+        # models with the same layoutKey have the same scalars for a location
+        self.layoutKey = (tuple(axisExtremes.items()), tuple(tuple(sorted(loc.items())) for loc in model.origLocations))
+
+    @classmethod
+    def fromSourceItems(cls, items, axisExtremes):
+        # items are (continuousLocation, mathGlyph, sourceInfo) as returned by collectSourcesForGlyph
+        # returns None if the sources can not be compiled, then the operator should take over.
+        sourceVectors = cls.collectSourceVectors(items, axisExtremes)
+        if sourceVectors is None:
+            return None
+        return cls.fromSourceVectors(*sourceVectors, axisExtremes)
+
+    @staticmethod
+    def collectSourceVectors(items, axisExtremes):
+        # (structure, normalized locations, one flat vector of coordinates and the width for each source)
+        # or None if the sources do not have the same structure
+        structure = None
+        vectors = []
+        locations = []
+        for loc, srcMath, info in items:
+            pen = StructureCollectorPointPen()
+            srcMath.drawPoints(pen)
+            if pen.hasComponents:
+                return None
+            if structure is None:
+                structure = pen.structure
+            elif pen.structure != structure:
+                return None
+            normalized = normalizeLocationForModel(loc, axisExtremes)
+            if normalized is None:
+                return None
+            pen.coordinates.append(srcMath.width)
+            vectors.append(pen.coordinates)
+            locations.append(normalized)
+        if not vectors:
+            return None
+        return structure, locations, vectors
+
+    @classmethod
+    def fromSourceVectors(cls, structure, locations, vectors, axisExtremes):
+        from fontTools.varLib.models import VariationModel, VariationModelError
+        try:
+            model = VariationModel(locations, axisOrder=list(axisExtremes.keys()))
+        except VariationModelError:
+            return None
+        numpy = getNumpy()
+        if numpy is not None:
+            masters = [numpy.array(v, dtype=float) for v in vectors]
+            deltas = numpy.array(model.getDeltas(masters))
+        else:
+            deltas = model.getDeltas([Vector(v) for v in vectors])
+        return cls(structure, model, deltas, axisExtremes)
+
+    def getScalars(self, location):
+        normalized = normalizeLocationForModel(location, self.axisExtremes)
+        if normalized is None:
+            return None
+        return self.model.getScalars(normalized)
+
+    def makeInstance(self, location):
+        # return the flat coordinates for this location, the last value is the width
+        scalars = self.getScalars(location)
+        if scalars is None:
+            return None
+        return self.makeInstanceFromScalars(scalars)
+
+    def makeInstanceFromScalars(self, scalars):
+        numpy = getNumpy()
+        if numpy is not None:
+            return numpy.dot(scalars, self.deltas)
+        return self.model.interpolateFromDeltasAndScalars(self.deltas, scalars)
+
+    def getWidth(self, coordinates):
+        return coordinates[-1]
+
+    def makeInstances(self, locations):
+        # the flat coordinates for many locations at once, one row per location
+        scalars = [self.getScalars(location) for location in locations]
+        if any(s is None for s in scalars):
+            return None
+        numpy = getNumpy()
+        if numpy is not None:
+            return numpy.dot(numpy.array(scalars, dtype=float).reshape(len(locations), -1), self.deltas)
+        return [self.model.interpolateFromDeltasAndScalars(self.deltas, s) for s in scalars]
+
+    def makePen(self, coordinates, shift=(0, 0)):
+        # an ArrayCollectorPen with the outline for these coordinates
+        if self.penLayout is not None:
+            return self.penLayout.makePen(coordinates, shift)
+        pen = ArrayCollectorPen(glyphSet={})
+        self.drawPoints(coordinates, PointToSegmentPen(pen), offset=shift)
+        return pen
+
+    def drawPoints(self, coordinates, pointPen, offset=(0, 0)):
+        # the sources come from mathglyphs, which add off-curves to straight segments.
+        # filter these like extractGlyph does.
+        pointPen = FilterRedundantPointPen(pointPen)
+        index = 0
+        dx, dy = offset
+        for contour in self.structure:
+            pointPen.beginPath()
+            for segmentType, smooth in contour:
+                pt = (float(coordinates[index]) + dx, float(coordinates[index+1]) + dy)
+                pointPen.addPoint(pt, segmentType=segmentType, smooth=smooth)
+                index += 2
+            pointPen.endPath()
+
+
+class PenLayout:
+    # Where the points of a model structure end up in an ArrayCollectorPen, worked out once.
+    # makePen fills the pen from the flat instance coordinates with an index lookup, with
+    # the same result as drawing the points through FilterRedundantPointPen and PointToSegmentPen.
+    # Three things depend on the coordinates and are checked for every instance:
+    # the curves that FilterRedundantPointPen turns back into lines, the closing lines
+    # that PointToSegmentPen leaves out, and contours that are filtered down to a single point.
+    # Structures with other segment types, quadratics or super beziers, have no layout.
+    def __init__(self, indices, pointTypes, startPoints, closed, curves, closingLines, collapsible):
+        self.indices = indices              # output position -> point index in the structure
+        self.pointTypes = pointTypes        # output position -> 1 on-curve, 0 off-curve
+        self.startPoints = startPoints      # output position of the first point of each contour
+        self.closed = closed
+        self.curves = curves                # (previous on-curve, off-curve, off-curve, on-curve, position of the first off-curve)
+        self.closingLines = closingLines    # (position, on-curve, previous on-curve, curve number or -1)
+        self.collapsible = collapsible      # (contour number, end position, curve numbers) for contours that can become one point
+        numpy = getNumpy()
+        if numpy is not None:
+            self.indexArray = numpy.array(indices, dtype=numpy.intp)
+            self.typeArray = numpy.array(pointTypes, dtype=numpy.uint8)
+            self.curveArray = numpy.array(curves, dtype=numpy.intp).reshape(-1, 5)
+
+    @classmethod
+    def fromStructure(cls, structure):
+        indices = []
+        pointTypes = []
+        startPoints = []
+        closed = []
+        curves = []
+        closingLines = []
+        collapsible = []
+        base = 0
+        for contour in structure:
+            types = [segmentType for segmentType, smooth in contour]
+            count = len(types)
+            if not count:
+                continue
+            if any(segmentType not in (None, "move", "line", "curve") for segmentType in types):
+                return None
+            # the curves FilterRedundantPointPen looks at, it indexes backwards into the contour
+            candidates = {}
+            for index, segmentType in enumerate(types):
+                if segmentType == "curve":
+                    if count < 3:
+                        return None
+                    if types[(index-3) % count] is not None:
+                        candidates[index] = base + (index-3) % count, base + (index-2) % count, base + (index-1) % count, base + index
+            # the segments, like BasePointToSegmentPen
+            isClosed = count > 1 and types[0] != "move"
+            if count == 1:
+                order = [0]
+            elif not isClosed:
+                order = list(range(count))
+            else:
+                onCurves = [index for index, segmentType in enumerate(types) if segmentType is not None]
+                if not onCurves:
+                    return None
+                order = list(range(onCurves[0]+1, count)) + list(range(onCurves[0]+1))
+            segments = []
+            current = []
+            for index in order:
+                current.append(index)
+                if types[index] is not None:
+                    segments.append(current)
+                    current = []
+            if current:
+                return None
+            startPoints.append(len(indices))
+            closed.append(1 if isClosed else 0)
+            if isClosed:
+                moveIndex = segments[-1][-1]
+            else:
+                moveIndex = segments.pop(0)[0]
+                if count == 1:
+                    segments = []
+            indices.append(base + moveIndex)
+            pointTypes.append(1)
+            previous = moveIndex
+            firstCurve = len(curves)
+            for number, segment in enumerate(segments):
+                index = segment[-1]
+                segmentType = types[index]
+                curveNumber = -1
+                if segmentType == "curve":
+                    if len(segment) != 3:
+                        return None
+                    if index in candidates:
+                        curveNumber = len(curves)
+                        curves.append(candidates[index] + (len(indices),))
+                    indices.extend((base + segment[0], base + segment[1]))
+                    pointTypes.extend((0, 0))
+                elif len(segment) != 1 or segmentType != "line":
+                    return None
+                if isClosed and number == len(segments) - 1 and (segmentType == "line" or curveNumber >= 0):
+                    closingLines.append((len(indices), base + index, base + previous, curveNumber))
+                indices.append(base + index)
+                pointTypes.append(1)
+                previous = index
+            if isClosed and count - 2 * (len(curves) - firstCurve) <= 1:
+                # when all its curves are filtered the contour is a single point, drawn as an open path
+                collapsible.append((len(closed) - 1, len(indices), tuple(range(firstCurve, len(curves)))))
+            base += count
+        return cls(indices, pointTypes, startPoints, closed, curves, closingLines, collapsible)
+
+    def _dropped(self, coordinates):
+        # the output positions that are not drawn for these coordinates, sorted,
+        # and the numbers of the closed contours that are drawn as a single point
+        numpy = getNumpy()
+        if numpy is not None:
+            # compare the points as complex numbers, x and y in one go
+            points = numpy.asarray(coordinates, dtype=float)[:-1].view(complex)
+            curves = self.curveArray
+            same = (points[curves[:, 0]] == points[curves[:, 1]]) & (points[curves[:, 2]] == points[curves[:, 3]])
+            redundant = numpy.nonzero(same)[0]
+            positions = curves[redundant, 4]
+            dropped = numpy.concatenate((positions, positions + 1)).tolist()
+            redundant = set(redundant.tolist())
+        else:
+            c = coordinates
+            dropped = []
+            redundant = set()
+            for number, (previous, off1, off2, on, position) in enumerate(self.curves):
+                if c[2*previous] == c[2*off1] and c[2*previous+1] == c[2*off1+1] and c[2*off2] == c[2*on] and c[2*off2+1] == c[2*on+1]:
+                    redundant.add(number)
+                    dropped.extend((position, position+1))
+        for position, on, previous, curveNumber in self.closingLines:
+            if curveNumber >= 0 and curveNumber not in redundant:
+                continue
+            if coordinates[2*on] != coordinates[2*previous] or coordinates[2*on+1] != coordinates[2*previous+1]:
+                # the implied closing line
+                dropped.append(position)
+        collapsed = set()
+        for contourNumber, end, curveNumbers in self.collapsible:
+            if all(number in redundant for number in curveNumbers):
+                collapsed.add(contourNumber)
+                start = self.startPoints[contourNumber]
+                dropped = [position for position in dropped if not start < position < end]
+                dropped.extend(range(start+1, end))
+        dropped.sort()
+        return dropped, collapsed
+
+    def makePen(self, coordinates, shift=(0, 0)):
+        dropped, collapsed = self._dropped(coordinates)
+        dx, dy = shift
+        pen = ArrayCollectorPen(glyphSet={})
+        numpy = getNumpy()
+        if numpy is not None:
+            points = numpy.asarray(coordinates, dtype=float)[:-1].reshape(-1, 2)
+            if dropped:
+                keep = numpy.ones(len(self.indices), dtype=bool)
+                keep[dropped] = False
+                points = points[self.indexArray[keep]]
+                pen.pointTypes.frombytes(self.typeArray[keep].tobytes())
+            else:
+                points = points[self.indexArray]
+                pen.pointTypes.frombytes(self.typeArray.tobytes())
+            if dx or dy:
+                points += (dx, dy)
+            pen.coordinates.frombytes(points.tobytes())
+        else:
+            skip = set(dropped)
+            c = coordinates
+            coordinateValues = pen.coordinates
+            for position, index in enumerate(self.indices):
+                if position in skip:
+                    continue
+                coordinateValues.append(float(c[2*index]) + dx)
+                coordinateValues.append(float(c[2*index+1]) + dy)
+                pen.pointTypes.append(self.pointTypes[position])
+        for start in self.startPoints:
+            pen.startPoints.append(start - bisect.bisect_left(dropped, start))
+        pen.closed.extend(self.closed)
+        for contourNumber in collapsed:
+            pen.closed[contourNumber] = 0
+        return pen
+
+
+def makeInstancesAtLocation(models, location):
+    # {glyphName: flat coordinates} for many compiled models at one location.
+    # The scalars only depend on the location and on where the sources of a model are.
+    # They are calculated once for each layout of sources, not again for every glyph.
+    scalarsForLayout = {}
+    instances = {}
+    for glyphName, model in models.items():
+        if model.layoutKey not in scalarsForLayout:
+            scalarsForLayout[model.layoutKey] = model.getScalars(location)
+        scalars = scalarsForLayout[model.layoutKey]
+        if scalars is not None:
+            instances[glyphName] = model.makeInstanceFromScalars(scalars)
+    return instances
+
+
+def glyphNamesForText(text, characterMapping):
+    # the glyph names for a preview string, like the space center: characters
+    # and /glyphName, a space or the next slash ends the name.
+    # characterMapping is {unicode: [glyphNames]}, characters that are not mapped are skipped.
+    glyphNames = []
+    index = 0
+    while index < len(text):
+        character = text[index]
+        if character == "/" and index + 1 < len(text) and text[index+1] not in " /":
+            end = index + 1
+            while end < len(text) and text[end] not in " /":
+                end += 1
+            glyphNames.append(text[index+1:end])
+            index = end
+            if index < len(text) and text[index] == " ":
+                index += 1
+            continue
+        names = characterMapping.get(ord(character))
+        if names:
+            glyphNames.append(names[0])
+        index += 1
+    return glyphNames
+
+
+def makeLinePens(glyphNames, models, instances, mathGlyphs, start=0):
+    # the outlines of a line of glyphs, each moved by the advances of the glyphs before it.
+    # The glyphs come from the batch instances, or from the mathglyphs of the operator
+    # for the glyphs that could not be compiled. Glyphs that have neither are skipped.
+    pens = []
+    x = start
+    for glyphName in glyphNames:
+        if glyphName in instances:
+            model = models[glyphName]
+            coordinates = instances[glyphName]
+            pens.append(model.makePen(coordinates, shift=(x, 0)))
+            x += float(model.getWidth(coordinates))
+        elif mathGlyphs.get(glyphName) is not None:
+            mathGlyph = mathGlyphs[glyphName]
+            pens.append(makeOutlinePen(mathGlyph, shift=(x, 0)))
+            x += mathGlyph.width
+    return pens
+
+
+def drawMathGlyphPoints(mathGlyph, pointPen, offset=(0, 0)):
+    # draw the contours of a mathglyph, moved by offset on the way.
+    # Like extractGlyph the redundant off-curves are filtered, but there is no glyph in between.
+    # Components are skipped, the source items are decomposed already.
+    if not mathGlyph.strict:
+        pointPen = FilterRedundantPointPen(pointPen)
+    dx, dy = offset
+    for contour in mathGlyph.contours:
+        pointPen.beginPath(identifier=contour["identifier"])
+        for segmentType, pt, smooth, name, identifier in contour["points"]:
+            pointPen.addPoint((pt[0] + dx, pt[1] + dy), segmentType=segmentType, smooth=smooth, name=name, identifier=identifier)
+        pointPen.endPath()
+
+
+def makeOutlinePen(mathGlyph, shift=(0, 0)):
+    # an ArrayCollectorPen with the outline of a mathglyph, the shift is applied in the same pass.
+    # The pen has the points for the vectors and markers and can replay the path for the layer.
+    pen = ArrayCollectorPen(glyphSet={})
+    drawMathGlyphPoints(mathGlyph, PointToSegmentPen(pen), offset=shift)
+    return pen
+
+
+class StructureSignaturePointPen(AbstractPointPen):
+    # Collect just enough to tell if the points of two glyphs can be paired:
+    # 2 at the start of each contour, then 1 for each on-curve and 0 for each off-curve point,
+    # and the base glyph names of the components.
+    def __init__(self):
+        self.types = bytearray()
+        self.components = []
+
+    def beginPath(self, identifier=None, **kwargs):
+        self.types.append(2)
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self.types.append(0 if segmentType is None else 1)
+
+    def endPath(self):
+        pass
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        self.components.append(baseGlyphName)
+
+
+def structureSignature(glyph):
+    # a compact hash of the contour and point type structure of a glyph
+    pen = StructureSignaturePointPen()
+    glyph.drawPoints(pen)
+    return hash((bytes(pen.types), tuple(pen.components)))
+
+
+# the names the default layer goes by in ufos and in RoboFont
+defaultLayerNames = (None, "public.default", "foreground")
+
+
+def getSourceLayer(font, layerName=None):
+    # the font itself for the default layer.
+    # fontParts fonts have getLayer, defcon fonts have layers
+    if layerName in defaultLayerNames:
+        return font
+    if hasattr(font, "getLayer"):
+        return font.getLayer(layerName)
+    return font.layers[layerName]
+
+
+class StructureSignatureIndex:
+    # The structure signature of each glyph in each source, made when it is first needed.
+    # Two sources with different signatures can not be paired point by point or interpolated,
+    # checking that is a comparison of two numbers instead of drawing both glyphs.
+    # When a glyph changes only its own entries are dropped.
+    def __init__(self):
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _key(self, font, glyphName, layerName=None):
+        if layerName in defaultLayerNames:
+            layerName = None
+        return font.path or id(font), layerName, glyphName
+
+    def _getGlyph(self, font, glyphName, layerName=None):
+        layer = getSourceLayer(font, layerName)
+        if glyphName not in layer:
+            return None
+        return layer[glyphName]
+
+    def signature(self, font, glyphName, layerName=None, glyph=None):
+        # None if the glyph is not in the font
+        key = self._key(font, glyphName, layerName)
+        if key not in self._signatures:
+            if glyph is None:
+                glyph = self._getGlyph(font, glyphName, layerName)
+            self._signatures[key] = None if glyph is None else structureSignature(glyph)
+        return self._signatures[key]
+
+    def signatureForSourceInfo(self, operator, info):
+        # info is the source info from collectSourcesForGlyph
+        font = getattr(operator, "fonts", {}).get(info.get("sourceName"))
+        if font is None:
+            return None
+        return self.signature(font, info['glyphName'], info.get('layerName'))
+
+    def sourceSignatures(self, operator, glyphName, discreteLocation=None):
+        # [(sourceDescriptor, signature)] for the sources at this discrete location
+        if discreteLocation:
+            sources = operator.findSourceDescriptorsForDiscreteLocation(discreteLocation)
+        else:
+            sources = operator.sources
+        signatures = []
+        for source in sources:
+            font = getattr(operator, "fonts", {}).get(source.name)
+            signature = None
+            if font is not None:
+                signature = self.signature(font, glyphName, source.layerName)
+            signatures.append((source, signature))
+        return signatures
+
+    def incompatibleSources(self, operator, items, signature):
+        # the paths of the sources with a different point structure than the signature,
+        # their points can not be paired with the points in the editor
+        incompatible = set()
+        if signature is None:
+            return incompatible
+        for loc, srcMath, info in items:
+            other = self.signatureForSourceInfo(operator, info)
+            if other is not None and other != signature:
+                incompatible.add(info['source'])
+        return incompatible
+
+    def glyphChanged(self, glyphName, fontPath=None):
+        for key in [key for key in self._signatures if key[2] == glyphName and (fontPath is None or key[0] == fontPath)]:
+            del self._signatures[key]
+
+    def clear(self):
+        self._signatures.clear()
+
+
+def checkInterpolationReadiness(signatureIndex, operator, glyphNames, discreteLocation=None):
+    # For each glyph: the sources where it is missing and the sources with a different structure
+    # than the most common one. Only the signatures are compared, nothing is drawn or interpolated.
+    # Returns rows of (glyphName, status, [missing source names], [incompatible source names])
+    rows = []
+    for glyphName in glyphNames:
+        signatures = signatureIndex.sourceSignatures(operator, glyphName, discreteLocation)
+        missing = [source.name for source, signature in signatures if signature is None]
+        counts = collections.Counter(signature for source, signature in signatures if signature is not None)
+        incompatible = []
+        if counts:
+            common = counts.most_common(1)[0][0]
+            incompatible = [source.name for source, signature in signatures if signature is not None and signature != common]
+        if incompatible:
+            status = "incompatible"
+        elif missing:
+            status = "missing"
+        else:
+            status = "ready"
+        rows.append((glyphName, status, missing, incompatible))
+    return rows
+
+
+def writeInterpolationReadiness(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["glyph", "status", "missing", "incompatible"])
+        for glyphName, status, missing, incompatible in rows:
+            writer.writerow([glyphName, status, " ".join(missing), " ".join(incompatible)])
+
+
+class DecomposedOutlinePointPen(AbstractPointPen):
+    # Record the contours of a glyph as tuples of points.
+    # Components are replaced by the decomposed outline of their base glyph from the cache.
+    def __init__(self, outlines, font, layerName, glyphName):
+        self.outlines = outlines
+        self.font = font
+        self.layerName = layerName
+        self.glyphName = glyphName
+        self.contours = []
+        self._identifier = None
+        self._points = None
+
+    def beginPath(self, identifier=None, **kwargs):
+        self._identifier = identifier
+        self._points = []
+
+    def addPoint(self, pt, segmentType=None, smooth=False, name=None, identifier=None, **kwargs):
+        self._points.append((segmentType, tuple(pt), smooth, name, identifier))
+
+    def endPath(self):
+        self.contours.append((self._identifier, tuple(self._points)))
+
+    def addComponent(self, baseGlyphName, transformation, identifier=None, **kwargs):
+        contours = self.outlines.componentOutline(self.font, self.layerName, self.glyphName, baseGlyphName, transformation)
+        self.contours.extend(contours)
+
+
+class DecomposedOutlineCache:
+    # The decomposed outline of each glyph in each source, made when a composite first needs it.
+    # Decomposing a composite draws each of its base glyphs, and theirs, all the way down.
+    # Here each base glyph is decomposed once and reused by all the composites that use it.
+    # While decomposing, the cache records which glyphs use which base glyph. When a base glyph
+    # changes only the composites that depend on it are dropped, everything else stays.
+    def __init__(self):
+        self._outlines = {}     # (fontKey, layerName, glyphName) -> tuple of contours
+        self._bases = {}        # (fontKey, layerName, glyphName) -> names of the base glyphs it uses
+        self._users = collections.defaultdict(set)      # (fontKey, layerName, baseGlyphName) -> names of the glyphs that use it
+        self._building = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._outlines)
+
+    def _key(self, font, glyphName, layerName=None):
+        if layerName in defaultLayerNames:
+            layerName = None
+        return font.path or id(font), layerName, glyphName
+
+    def _addDependency(self, font, layerName, glyphName, baseGlyphName):
+        fontKey, layerName, glyphName = self._key(font, glyphName, layerName)
+        self._bases.setdefault((fontKey, layerName, glyphName), set()).add(baseGlyphName)
+        self._users[(fontKey, layerName, baseGlyphName)].add(glyphName)
+
+    def addDependencies(self, font, layerName, glyphName, baseGlyphNames):
+        # record the base glyphs of a composite that was not decomposed here
+        for baseGlyphName in baseGlyphNames:
+            self._addDependency(font, layerName, glyphName, baseGlyphName)
+
+    def outline(self, font, glyphName, layerName=None):
+        # the decomposed contours of this glyph, None if it is not in the layer
+        key = self._key(font, glyphName, layerName)
+        if key in self._outlines:
+            self.hits += 1
+            return self._outlines[key]
+        self.misses += 1
+        layer = getSourceLayer(font, layerName)
+        if glyphName not in layer or key in self._building:
+            # a missing base glyph or a component loop, both draw nothing
+            return None
+        self._building.add(key)
+        try:
+            pen = DecomposedOutlinePointPen(self, font, layerName, glyphName)
+            layer[glyphName].drawPoints(pen)
+        finally:
+            self._building.discard(key)
+        contours = self._outlines[key] = tuple(pen.contours)
+        return contours
+
+    def componentOutline(self, font, layerName, glyphName, baseGlyphName, transformation):
+        # the decomposed contours of a component of glyphName, transformed
+        self._addDependency(font, layerName, glyphName, baseGlyphName)
+        contours = self.outline(font, baseGlyphName, layerName)
+        if not contours:
+            return ()
+        transform = Transform(*transformation)
+        if transform == Identity:
+            return contours
+        transformed = []
+        for identifier, points in contours:
+            transformed.append((identifier, tuple((segmentType, transform.transformPoint(pt), smooth, name, pointIdentifier) for segmentType, pt, smooth, name, pointIdentifier in points)))
+        return transformed
+
+    def decompose(self, font, mathGlyph, layerName=None):
+        # A copy of the mathGlyph with its components replaced by their outlines.
+        # The mathGlyph itself may be in the operator cache, so it is never changed.
+        if not mathGlyph.components:
+            return mathGlyph
+        decomposed = mathGlyph.copy()
+        decomposed.components = []
+        pen = MathGlyphPen(decomposed, strict=decomposed.strict)
+        for component in mathGlyph.components:
+            contours = self.componentOutline(font, layerName, mathGlyph.name, component['baseGlyph'], component['transformation'])
+            for identifier, points in contours:
+                pen.beginPath(identifier=identifier)
+                for segmentType, pt, smooth, name, pointIdentifier in points:
+                    pen.addPoint(pt, segmentType=segmentType, smooth=smooth, name=name, identifier=pointIdentifier)
+                pen.endPath()
+        return decomposed
+
+    def decomposeSourceItems(self, operator, items):
+        # items from collectSourcesForGlyph with decomposeComponents=False,
+        # returned as if they were collected with decomposeComponents=True
+        fonts = getattr(operator, "fonts", {})
+        decomposedItems = []
+        for loc, mathGlyph, info in items:
+            font = fonts.get(info.get('sourceName'))
+            if font is not None:
+                mathGlyph = self.decompose(font, mathGlyph, info.get('layerName'))
+            decomposedItems.append((loc, mathGlyph, info))
+        return decomposedItems
+
+    def dependents(self, glyphName, fontPath=None):
+        # the names of all the composites that use this glyph, directly or through other composites
+        found = set()
+        todo = [(key, glyphName) for key in self._users if key[2] == glyphName and (fontPath is None or key[0] == fontPath)]
+        while todo:
+            key, name = todo.pop()
+            for user in self._users.get((key[0], key[1], name), ()):
+                if user not in found:
+                    found.add(user)
+                    todo.append((key, user))
+        return found
+
+    def glyphChanged(self, glyphName, fontPath=None):
+        # Drop the outline of this glyph and of the composites that use it.
+        # The components of this glyph may have changed, they are recorded again when it is decomposed.
+        # Returns the names of the dependent composites.
+        dependents = self.dependents(glyphName, fontPath)
+        names = dependents | {glyphName}
+        for key in [key for key in self._outlines if key[2] in names and (fontPath is None or key[0] == fontPath)]:
+            del self._outlines[key]
+        for key in [key for key in self._bases if key[2] == glyphName and (fontPath is None or key[0] == fontPath)]:
+            for baseGlyphName in self._bases.pop(key):
+                users = self._users.get((key[0], key[1], baseGlyphName))
+                if users is not None:
+                    users.discard(glyphName)
+                    if not users:
+                        del self._users[(key[0], key[1], baseGlyphName)]
+        return dependents
+
+    def clear(self):
+        self._outlines.clear()
+        self._bases.clear()
+        self._users.clear()
+
+
+_componentBasePattern = re.compile(rb'<component\s[^>]*?base="([^"]+)"')
+
+class ModelDiskCache:
+    # The source vectors of the compiled models on disk, so reopening a designspace
+    # or going back to a glyph starts warm instead of collecting and decomposing the sources.
+    # An entry is keyed by the designspace, the glyph, the discrete location, the axes, the muting
+    # and a hash of the .glif files of the glyph and its component base glyphs in every source.
+    # A source with unsaved changes does not match its files, glyphs from it are not cached.
+    # Entries are written to a temporary file and moved in place, and never changed after that,
+    # so any number of processes can read them at the same time. Reading maps the file.
+    # Reading an entry touches it, when the files take more than maxBytes the least
+    # recently used ones are removed.
+    magic = b"LBM1"
+    suffix = ".lbm"
+
+    def __init__(self, directory, maxBytes=256*1024*1024):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self._size = None
+        self._glyphFileNames = {}   # glyphs directory -> (mtime, {glyphName: fileName})
+        self._digests = {}          # glif path -> (mtime, size, digest, component base names)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _glyphsDirectory(self, ufoPath, layerName=None):
+        if layerName in defaultLayerNames:
+            return os.path.join(ufoPath, "glyphs")
+        try:
+            with open(os.path.join(ufoPath, "layercontents.plist"), "rb") as f:
+                layerContents = plistlib.load(f)
+        except (OSError, ValueError):
+            return None
+        for name, directoryName in layerContents:
+            if name == layerName:
+                return os.path.join(ufoPath, directoryName)
+        return None
+
+    def _fileNames(self, glyphsDirectory):
+        contentsPath = os.path.join(glyphsDirectory, "contents.plist")
+        try:
+            mtime = os.stat(contentsPath).st_mtime_ns
+        except OSError:
+            return {}
+        stored = self._glyphFileNames.get(glyphsDirectory)
+        if stored is None or stored[0] != mtime:
+            try:
+                with open(contentsPath, "rb") as f:
+                    stored = self._glyphFileNames[glyphsDirectory] = mtime, plistlib.load(f)
+            except (OSError, ValueError):
+                return {}
+        return stored[1]
+
+    def _glifDigest(self, path):
+        # (digest, component base names) for a glif file, None if it is not there
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stored = self._digests.get(path)
+        if stored is None or stored[:2] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, "rb") as f:
+                data = f.read()
+            bases = [name.decode("utf-8") for name in _componentBasePattern.findall(data)]
+            stored = self._digests[path] = stat.st_mtime_ns, stat.st_size, hashlib.sha1(data).hexdigest(), bases
+        return stored[2:]
+
+    def _componentTree(self, ufoPath, layerName, glyphName):
+        # [(glyphName, digest, component base names)] for the glyph and all the glyphs it uses as components in this layer
+        glyphsDirectory = self._glyphsDirectory(ufoPath, layerName)
+        if glyphsDirectory is None:
+            return []
+        fileNames = self._fileNames(glyphsDirectory)
+        tree = []
+        seen = set()
+        todo = [glyphName]
+        while todo:
+            name = todo.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            fileName = fileNames.get(name)
+            found = None if fileName is None else self._glifDigest(os.path.join(glyphsDirectory, fileName))
+            if found is None:
+                tree.append((name, None, []))
+                continue
+            digest, bases = found
+            tree.append((name, digest, bases))
+            todo.extend(bases)
+        return tree
+
+    def glyphDigests(self, ufoPath, layerName, glyphName):
+        # [(glyphName, digest)] for the glyph and all the glyphs it uses as components in this layer
+        return sorted((name, digest) for name, digest, bases in self._componentTree(ufoPath, layerName, glyphName))
+
+    def componentBases(self, operator, glyphName, discreteLocation):
+        # (font, layerName, glyphName, component base names) for the glyph and the glyphs
+        # it uses as components in each source, read from the same files as the key.
+        # A model from disk skips decomposing, this is what decomposing would have recorded.
+        if discreteLocation:
+            sources = operator.findSourceDescriptorsForDiscreteLocation(discreteLocation)
+        else:
+            sources = operator.sources
+        fonts = getattr(operator, "fonts", {})
+        for source in sources:
+            font = fonts.get(source.name)
+            if font is None or not font.path:
+                continue
+            for name, digest, bases in self._componentTree(font.path, source.layerName, glyphName):
+                if bases:
+                    yield font, source.layerName, name, bases
+
+    def makeKey(self, operator, glyphName, discreteLocation, axisExtremes):
+        # None if the glyph can not be cached: the designspace or a source is not saved
+        if not getattr(operator, "path", None):
+            return None
+        if discreteLocation:
+            sources = operator.findSourceDescriptorsForDiscreteLocation(discreteLocation)
+        else:
+            sources = operator.sources
+        fonts = getattr(operator, "fonts", {})
+        tempLib = getattr(operator, "tempLib", {})
+        parts = [operator.path, glyphName, locationKey(discreteLocation), tuple(axisExtremes.items()),
+            repr(tempLib.get(getattr(operator, "mutedDesignLocationsLibKey", None))),
+            repr(getattr(operator, "mutedAxisNames", None))]
+        for source in sources:
+            font = fonts.get(source.name)
+            if font is None:
+                parts.append((source.name, None))
+                continue
+            naked = font.naked() if hasattr(font, "naked") else font
+            if not font.path or getattr(naked, "dirty", False):
+                return None
+            parts.append((source.name, repr(sorted(source.location.items())), source.layerName,
+                glyphName in (source.mutedGlyphNames or ()), self.glyphDigests(font.path, source.layerName, glyphName)))
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key, axisExtremes):
+        # the compiled model for this key, or None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    sourceVectors = self._read(data)
+        except (OSError, ValueError, KeyError, struct.error):
+            # missing, or not written by this version
+            sourceVectors = None
+        if sourceVectors is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # reading makes it recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return GlyphInterpolationModel.fromSourceVectors(*sourceVectors, axisExtremes)
+
+    def _read(self, data):
+        if data[:4] != self.magic:
+            return None
+        headerLength, = struct.unpack("<I", data[4:8])
+        header = json.loads(data[8:8+headerLength].decode("utf-8"))
+        start = 8 + headerLength
+        start += -start % 8
+        count = header['count']
+        length = header['length']
+        if len(data) != start + 8 * count * length:
+            return None
+        values = array('d')
+        values.frombytes(data[start:])
+        vectors = [values[i*length:(i+1)*length].tolist() for i in range(count)]
+        structure = tuple(tuple((segmentType, smooth) for segmentType, smooth in contour) for contour in header['structure'])
+        return structure, header['locations'], vectors
+
+    def set(self, key, sourceVectors):
+        # sourceVectors as made by GlyphInterpolationModel.collectSourceVectors
+        structure, locations, vectors = sourceVectors
+        header = json.dumps(dict(structure=structure, locations=locations, count=len(vectors), length=len(vectors[0]))).encode("utf-8")
+        data = bytearray(self.magic)
+        data += struct.pack("<I", len(header))
+        data += header
+        data += bytes(-len(data) % 8)
+        data += array('d', [value for vector in vectors for value in vector]).tobytes()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporaryPath = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(handle, "wb") as f:
+                f.write(data)
+            os.replace(temporaryPath, self._path(key))
+        except OSError:
+            return
+        self.writes += 1
+        if self._size is not None:
+            self._size += len(data)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        # remove the least recently used entries until the cache is under 80% of maxBytes
+        if self._size is None:
+            self._size = sum(size for mtime, size, path in self._entries())
+        if self._size <= self.maxBytes:
+            return
+        entries = sorted(self._entries())
+        self._size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self._size <= .8 * self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._size -= size
+
+    def clear(self):
+        for mtime, size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._size = 0
+
+
+class PreviewPrefetcher:
+    # While the navigator drags, the next preview locations are predictable:
+    # one increment at a time along the drag direction. The prefetcher calculates
+    # the instances for the next few steps with the compiled model in a worker thread
+    # and keeps them in a small LRU cache, so the next redraw usually finds its
+    # coordinates ready. The model is only read, so this is safe outside the main thread.
+    # The model is kept with its instances so a key with the id of a model that is gone can not match.
+    def __init__(self, maxSize=128, workers=2):
+        self.maxSize = maxSize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="longboardPrefetch")
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, model, location):
+        return id(model), locationKey(location)
+
+    def get(self, model, location):
+        key = self._key(model, location)
+        with self._lock:
+            stored = self._items.get(key)
+            if stored is None or stored[0] is not model:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return stored[1]
+
+    def _store(self, model, locations):
+        instances = model.makeInstances(locations)
+        if instances is None:
+            return
+        with self._lock:
+            for location, coordinates in zip(locations, instances):
+                key = self._key(model, location)
+                self._items[key] = model, coordinates
+                self._items.move_to_end(key)
+            while len(self._items) > self.maxSize:
+                self._items.popitem(last=False)
+
+    def prefetch(self, model, location, increments, count=8):
+        # increments: {axisName: signed step} for the axes that are moving
+        locations = []
+        for i in range(1, count+1):
+            nextLocation = dict(location)
+            for axisName, increment in increments.items():
+                nextLocation[axisName] = location[axisName] + i * increment
+            stored = self._items.get(self._key(model, nextLocation))
+            if stored is None or stored[0] is not model:
+                locations.append(nextLocation)
+        if locations:
+            self._executor.submit(self._store, model, locations)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.clear()
+
+
+class InterpolationService:
+    # There is a LongboardEditorView for every glyph editor, but they all share this
+    # service: the compiled models, the operator results and the prefetched instances.
+    # The preview each editor is showing is reference counted, keyed by operator,
+    # glyph and location. When several windows show the same glyph at the same
+    # preview location it is calculated once, the others pick up the result.
+    # When no editor holds a result anymore it moves to the LRU cache.
+    def __init__(self):
+        self.cache = InterpolationCache()
+        self.signatures = StructureSignatureIndex()
+        self.decomposed = DecomposedOutlineCache()
+        # a ModelDiskCache, if the models should be kept between sessions
+        self.diskCache = None
+        self.prefetcher = None
+        self._shared = {}       # key -> [value, set of holders]
+        self._held = {}         # holder -> key
+        self._holders = set()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, holder):
+        if self.prefetcher is None:
+            self.prefetcher = PreviewPrefetcher()
+        self._holders.add(holder)
+
+    def unregister(self, holder):
+        self.release(holder)
+        self._holders.discard(holder)
+        if not self._holders:
+            # the last editor closed
+            if self.prefetcher is not None:
+                self.prefetcher.shutdown()
+                self.prefetcher = None
+            self.clear()
+
+    def holderCount(self, key):
+        entry = self._shared.get(key)
+        if entry is None:
+            return 0
+        return len(entry[1])
+
+    def get(self, holder, key, calculate=None):
+        # the value for this key, calculate() is only called when no other
+        # editor holds it and it is not in the cache. The holder keeps the
+        # value until it asks for another key or is released.
+        # Without calculate this only looks, for results made elsewhere.
+        entry = self._shared.get(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            value = self.cache.get(key)
+            if value is None:
+                if calculate is None:
+                    return None
+                value = calculate()
+                if value is None:
+                    return None
+            entry = self._shared[key] = [value, set()]
+        if self._held.get(holder) != key:
+            self.release(holder)
+            entry[1].add(holder)
+            self._held[holder] = key
+        return entry[0]
+
+    def release(self, holder):
+        key = self._held.pop(holder, None)
+        entry = self._shared.get(key)
+        if entry is None:
+            return
+        entry[1].discard(holder)
+        if not entry[1]:
+            del self._shared[key]
+            self.cache.set(key, entry[0])
+
+    def glyphChanged(self, glyphName, fontPath=None):
+        # the glyph itself and the composites that use it
+        names = self.decomposed.glyphChanged(glyphName, fontPath) | {glyphName}
+        for name in names:
+            self.cache.glyphChanged(name)
+        self.signatures.glyphChanged(glyphName, fontPath)
+        if self.prefetcher is not None:
+            self.prefetcher.clear()
+        for key in [key for key in self._shared if key[1] in names]:
+            del self._shared[key]
+        return names
+
+    def collectSourceItems(self, operator, glyphName, discreteLocation):
+        # the source mathglyphs with the components decomposed
+        key = self.cache.makeKey("sources", operator, glyphName, discreteLocation)
+        items = self.cache.get(key)
+        if items is None:
+            with pipelineTimer.span("collectSourcesForGlyph"):
+                items, unicodes = operator.collectSourcesForGlyph(glyphName=glyphName, decomposeComponents=False, discreteLocation=discreteLocation)
+            with pipelineTimer.span("decompose"):
+                items = self.decomposed.decomposeSourceItems(operator, items)
+            self.cache.set(key, items)
+        return items
+
+    def getInterpolationModel(self, operator, glyphName, discreteLocation, locationIndex):
+        # the compiled model, None if the sources can not be compiled
+        # locationIndex is the SourceLocationIndex of the operator
+        key = self.cache.makeKey("model", operator, glyphName, discreteLocation)
+        model = self.cache.get(key)
+        if model is None:
+            axisExtremes = locationIndex.getAxisExtremes()
+            diskKey = None
+            if self.diskCache is not None:
+                # the model may be on disk from an earlier session
+                with pipelineTimer.span("diskCache"):
+                    diskKey = self.diskCache.makeKey(operator, glyphName, discreteLocation, axisExtremes)
+                    if diskKey is not None:
+                        model = self.diskCache.get(diskKey, axisExtremes)
+                    if model is not None:
+                        # so an edit to a base glyph still drops this composite
+                        for font, layerName, name, bases in self.diskCache.componentBases(operator, glyphName, discreteLocation):
+                            self.decomposed.addDependencies(font, layerName, name, bases)
+            if model is None:
+                items = self.collectSourceItems(operator, glyphName, discreteLocation)
+                signatures = set(self.signatures.signatureForSourceInfo(operator, info) for loc, srcMath, info in items)
+                signatures.discard(None)
+                sourceVectors = None
+                if len(signatures) < 2:
+                    # when the structures differ there is no need to try
+                    sourceVectors = GlyphInterpolationModel.collectSourceVectors(items, axisExtremes)
+                if sourceVectors is not None:
+                    model = GlyphInterpolationModel.fromSourceVectors(*sourceVectors, axisExtremes)
+                    if model is not None and diskKey is not None:
+                        self.diskCache.set(diskKey, sourceVectors)
+            if model is None:
+                # remember we tried, the operator will do the work for this glyph
+                model = False
+            self.cache.set(key, model)
+        return model or None
+
+    def makeInstance(self, model, location):
+        # the prefetched coordinates if they are there
+        # the model is only read, this can run outside the main thread
+        coordinates = None
+        if self.prefetcher is not None:
+            coordinates = self.prefetcher.get(model, location)
+        if coordinates is None:
+            with pipelineTimer.span("makeInstance"):
+                coordinates = model.makeInstance(location)
+        return coordinates
+
+    def makeOneGlyph(self, operator, glyphName, location):
+        with pipelineTimer.span("makeOneGlyph"):
+            return operator.makeOneGlyph(glyphName, location=location)
+
+    def makePreviewMathGlyph(self, holder, operator, glyphName, discreteLocation, location):
+        key = self.cache.makeKey("preview", operator, glyphName, discreteLocation, location)
+        return self.get(holder, key, lambda: self.makeOneGlyph(operator, glyphName, location))
+
+    def getBatchModels(self, operator, glyphNames, discreteLocation, location, locationIndex):
+        # The compiled models for many glyphs, for makeInstancesAtLocation.
+        # The glyphs that can not be compiled get the mathglyph from the operator instead.
+        models = {}
+        mathGlyphs = {}
+        for glyphName in set(glyphNames):
+            model = self.getInterpolationModel(operator, glyphName, discreteLocation, locationIndex)
+            if model is not None:
+                models[glyphName] = model
+                continue
+            key = self.cache.makeKey("preview", operator, glyphName, discreteLocation, location)
+            mathGlyph = self.cache.get(key)
+            if mathGlyph is None:
+                mathGlyph = self.makeOneGlyph(operator, glyphName, location)
+                if mathGlyph is not None:
+                    self.cache.set(key, mathGlyph)
+            mathGlyphs[glyphName] = mathGlyph
+        return models, mathGlyphs
+
+    def operatorClosed(self, operator):
+        # forget everything that was made with this operator
+        self.cache.operatorClosed(operator)
+        for key in [key for key in self._shared if key[2] == id(operator)]:
+            del self._shared[key]
+
+    def clear(self):
+        self.cache.clear()
+        self.signatures.clear()
+        self.decomposed.clear()
+        if self.prefetcher is not None:
+            self.prefetcher.clear()
+        self._shared.clear()
+        self._held.clear()
+
+
+interpolationService = InterpolationService()
+
+
+def makeSweepLocations(axisExtremes, steps=5):
+    # a grid of locations over all the continuous axes, with steps values per axis
+    names = list(axisExtremes.keys())
+    values = []
+    for name in names:
+        minimum, default, maximum = axisExtremes[name]
+        if steps < 2 or minimum == maximum:
+            values.append([default])
+        else:
+            values.append([minimum + i*(maximum-minimum)/(steps-1) for i in range(steps)])
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def measurementSweep(model, beams, locations, centerOnWidth=None):
+    # Intersect the beams with the glyph at each of the locations.
+    # All instances are calculated in one go with the compiled model.
+    # If centerOnWidth is given, each instance is centered on that width,
+    # like the preview in the glyph editor.
+    # Returns a row for each location and beam: (location, beamIndex, [distances])
+    rows = []
+    instances = model.makeInstances(locations)
+    if instances is None:
+        return rows
+    for location, coordinates in zip(locations, instances):
+        shift = 0
+        if centerOnWidth is not None:
+            shift = .5*centerOnWidth - .5*float(model.getWidth(coordinates))
+        segments = OutlineSegments(model.makePen(coordinates, shift=(shift, 0)))
+        for beamIndex, intersects in enumerate(segments.intersectBeams(beams)):
+            distances = []
+            for mp1, mp2 in zip(intersects[:-1], intersects[1:]):
+                distances.append(math.hypot(mp1[0]-mp2[0], mp1[1]-mp2[1]))
+            rows.append((location, beamIndex, distances))
+    return rows
+
+
+def writeMeasurementSweep(rows, path):
+    # write the rows from measurementSweep as a csv file, one column per axis and per distance
+    axisNames = []
+    maxDistances = 0
+    for location, beamIndex, distances in rows:
+        for name in location.keys():
+            if name not in axisNames:
+                axisNames.append(name)
+        maxDistances = max(maxDistances, len(distances))
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(axisNames + ["beam"] + [f"distance {i}" for i in range(maxDistances)])
+        for location, beamIndex, distances in rows:
+            writer.writerow([location.get(name) for name in axisNames] + [beamIndex] + [f"{d:3.2f}" for d in distances])
+
+
+def pairVectors(editorPen, sourcePens, onCurves=True, offCurves=True):
+    # the vectors from the points in the editor glyph to the same points in the sources
+    # returns two lists of (startPoint, endPoint), for the on-curve and off-curve points
+    onCurveVectors = []
+    offCurveVectors = []
+    if onCurves:
+        editorPoints = editorPen.onCurves
+        for pen in sourcePens:
+            onCurveVectors.extend(zip(editorPoints, pen.onCurves))
+    if offCurves:
+        editorPoints = editorPen.offCurves
+        for pen in sourcePens:
+            offCurveVectors.extend(zip(editorPoints, pen.offCurves))
+    return onCurveVectors, offCurveVectors
+
+
+def measureBeams(beams, previewPen, curveOffset=70):
+    # intersections for the measuring beams and the preview
+    # the preview outline is flattened once and intersected with all beams at once
+    # returns the jumper curves, the marker points and the (position, text) labels
+    jumpers = []
+    markerPoints = []
+    labels = []
+    segments = OutlineSegments(previewPen)
+    for intersects in segments.intersectBeams(beams):
+        for mp1, mp2 in zip(intersects[:-1], intersects[1:]):
+            measureLineAngle = math.atan2(mp1[1]-mp2[1], mp1[0]-mp2[0]) - .5*math.pi
+            needlex = math.cos(measureLineAngle) * curveOffset
+            needley = math.sin(measureLineAngle) * curveOffset
+            # the jumper curve
+            jumpers.append((mp1, (mp1[0]+needlex, mp1[1]+needley), (mp2[0]+needlex, mp2[1]+needley), (mp2[0], mp2[1])))
+            # the end markers
+            markerPoints.append(mp1)
+            markerPoints.append(mp2)
+            # the measurement distance text
+            textPos = .5*(mp1[0]+mp2[0])+needlex, .5*(mp1[1]+mp2[1])+needley
+            dist = math.hypot(mp1[0]-mp2[0], mp1[1]-mp2[1])
+            labels.append((textPos, f"{dist:3.2f}"))
+    return jumpers, markerPoints, labels
+
+
+# Batched drawing.
+# These draw everything of one kind into a single path sublayer of the container,
+# rather than one sublayer per vector or marker. They only need appendPathSublayer
+# and getPen from the container, so they can be checked with a stand-in object.
+
+markerKappa = 0.5522847498
+
+def drawMarker(pen, pt, size):
+    # draw a small closed oval around pt
+    x, y = pt
+    r = .5 * size
+    k = r * markerKappa
+    pen.moveTo((x+r, y))
+    pen.curveTo((x+r, y+k), (x+k, y+r), (x, y+r))
+    pen.curveTo((x-k, y+r), (x-r, y+k), (x-r, y))
+    pen.curveTo((x-r, y-k), (x-k, y-r), (x, y-r))
+    pen.curveTo((x+k, y-r), (x+r, y-k), (x+r, y))
+    pen.closePath()
+
+def appendVectorsLayer(container, vectors, strokeColor, strokeWidth=1, strokeDash=None):
+    # all vectors as one dashed path
+    layer = container.appendPathSublayer(
+        fillColor=None,
+        strokeColor=strokeColor,
+        strokeWidth=strokeWidth,
+        strokeDash=strokeDash,
+    )
+    pen = layer.getPen(clear=True)
+    for a, b in vectors:
+        pen.moveTo(a)
+        pen.lineTo(b)
+        pen.endPath()
+    return layer
+
+def appendMarkersLayer(container, points, size, fillColor):
+    # all markers as one compound path
+    layer = container.appendPathSublayer(
+        fillColor=fillColor,
+        strokeColor=None,
+    )
+    pen = layer.getPen(clear=True)
+    for pt in points:
+        drawMarker(pen, pt, size)
+    return layer
+
+def appendJumpersLayer(container, jumpers, strokeColor, strokeWidth):
+    # jumpers: list of (startPoint, bcp1, bcp2, endPoint)
+    layer = container.appendPathSublayer(
+        fillColor=None,
+        strokeColor=strokeColor,
+        strokeWidth=strokeWidth,
+    )
+    pen = layer.getPen(clear=True)
+    for start, bcp1, bcp2, end in jumpers:
+        pen.moveTo(start)
+        pen.curveTo(bcp1, bcp2, end)
+        pen.endPath()
+    return layer
+
+
+class SublayerPool:
+    # Keep the sublayers of a container alive between redraws.
+    # The pool has the same append...Sublayer methods as the container, but
+    # these hand out the layers from the previous redraw before making new ones,
+    # and only call the setters for the attributes that changed.
+    # Call begin() before drawing and end() after: end() hides the layers
+    # that were not needed this time instead of removing them.
+    def __init__(self, container):
+        self.container = container
+        self.layers = {}
+        self.states = {}
+        self.used = {}
+        self.created = 0
+
+    def begin(self):
+        self.used = {}
+
+    def _get(self, method, attributes):
+        layers = self.layers.setdefault(method, [])
+        states = self.states.setdefault(method, [])
+        index = self.used.get(method, 0)
+        self.used[method] = index + 1
+        if index == len(layers):
+            layer = getattr(self.container, method)(**attributes)
+            layers.append(layer)
+            states.append(dict(attributes, visible=True))
+            self.created += 1
+            return layer
+        layer = layers[index]
+        state = states[index]
+        if not state['visible']:
+            layer.setVisible(True)
+            state['visible'] = True
+        for name, value in attributes.items():
+            if state.get(name) != value:
+                getattr(layer, "set" + name[0].upper() + name[1:])(value)
+                state[name] = value
+        return layer
+
+    def pathChanged(self, layer, key):
+        # True if the path key for this layer is different from the last time
+        # the key is stored, so the caller can skip rebuilding paths that did not change
+        for method, layers in self.layers.items():
+            for index, candidate in enumerate(layers):
+                if candidate is layer:
+                    state = self.states[method][index]
+                    if state.get('pathKey') == key:
+                        return False
+                    state['pathKey'] = key
+                    return True
+        return True
+
+    def appendPathSublayer(self, **attributes):
+        return self._get("appendPathSublayer", attributes)
+
+    def appendLineSublayer(self, **attributes):
+        return self._get("appendLineSublayer", attributes)
+
+    def appendSymbolSublayer(self, **attributes):
+        return self._get("appendSymbolSublayer", attributes)
+
+    def appendTextLineSublayer(self, **attributes):
+        return self._get("appendTextLineSublayer", attributes)
+
+    def end(self):
+        for method, layers in self.layers.items():
+            states = self.states[method]
+            for index in range(self.used.get(method, 0), len(layers)):
+                if states[index]['visible']:
+                    layers[index].setVisible(False)
+                    states[index]['visible'] = False
+
+    def recolor(self, colorMap):
+        # change the colors of the existing layers in place
+        # colorMap: old color -> new color
+        for method, layers in self.layers.items():
+            for layer, state in zip(layers, self.states[method]):
+                for name in ('strokeColor', 'fillColor', 'backgroundColor'):
+                    value = state.get(name)
+                    if value in colorMap:
+                        value = colorMap[value]
+                        getattr(layer, "set" + name[0].upper() + name[1:])(value)
+                        state[name] = value
+
+    def clear(self):
+        self.container.clearSublayers()
+        self.layers = {}
+        self.states = {}
+        self.used = {}
+
+
+class RenderNode:
+    # One overlay in the glyph editor, drawn in its own pools.
+    # The node remembers the inputs it was last drawn with,
+    # when they are the same the layers are left as they are.
+    # Hidden overlays use False as inputs and are drawn once, empty.
+    def __init__(self, name, pools):
+        self.name = name
+        self.pools = pools
+        self.inputs = None
+
+    def isDirty(self, inputs):
+        return self.inputs is None or self.inputs != inputs
+
+    def invalidate(self):
+        self.inputs = None
+
+    def begin(self):
+        for pool in self.pools:
+            pool.begin()
+
+    def end(self, inputs):
+        for pool in self.pools:
+            pool.end()
+        self.inputs = inputs
+
+
+class LevelOfDetail:
+    # Which render nodes to draw while the navigator drags, from the most to the least detail.
+    # After every frame the level drops when the frame went over the budget,
+    # and comes back one step when the frame took less than half of it.
+    # The sources, the vectors and the measurements are not in any level: they are only
+    # kept while they are still right, and hidden when they would have to be drawn again.
+    defaultLevels = (
+        ("preview", "previewMarkers", "previewLine"),
+        ("preview", "previewMarkers"),
+        ("preview",),
+    )
+
+    def __init__(self, levels=defaultLevels, budget=1/60):
+        self.levels = [set(level) for level in levels]
+        self.budget = budget
+        self.level = 0
+        self.lastFrame = None
+
+    @property
+    def nodes(self):
+        return self.levels[self.level]
+
+    def reset(self):
+        self.level = 0
+        self.lastFrame = None
+
+    def frameDidFinish(self, seconds):
+        self.lastFrame = seconds
+        if seconds > self.budget:
+            self.level = min(self.level + 1, len(self.levels) - 1)
+        elif seconds < .5 * self.budget:
+            self.level = max(self.level - 1, 0)
+
+
+# Stand-ins for merz, so the layer drawing can run and be counted without RoboFont.
+
+class StandInPen:
+    def __init__(self):
+        self.value = []
+
+    def moveTo(self, pt):
+        self.value.append(pt)
+
+    def lineTo(self, pt):
+        self.value.append(pt)
+
+    def curveTo(self, *points):
+        self.value.extend(points)
+
+    def closePath(self):
+        pass
+
+    def endPath(self):
+        pass
+
+
+class StandInLayer:
+    def __init__(self, container):
+        self.container = container
+
+    def getPen(self, clear=True):
+        return StandInPen()
+
+    def __getattr__(self, name):
+        if name.startswith("set"):
+            return lambda *args, **kwargs: None
+        raise AttributeError(name)
+
+
+class CountingContainer:
+    # counts how many sublayers are made
+    def __init__(self):
+        self.layerCount = 0
+
+    def _append(self, **kwargs):
+        self.layerCount += 1
+        return StandInLayer(self)
+
+    appendPathSublayer = _append
+    appendLineSublayer = _append
+    appendSymbolSublayer = _append
+    appendTextLineSublayer = _append
+
+
+# The look of the overlays, the same in the glyph editor, the replay and the svg renders.
+
+def makeOverlayColors(hazeValue):
+    return dict(
+        sourceStrokeColor=(0, 0, 1, hazeValue),
+        previewStrokeColor=(0, 0, 0, hazeValue),
+        previewFillColor=(.8, .8, .8, hazeValue),
+        vectorStrokeColor=(0, 0, 1, hazeValue),
+        measurementStrokeColor=(.5, 0, 1, hazeValue),
+        measurementFillColor=(.5, 0, 1, hazeValue),
+    )
+
+markerSize = 5
+previewMarkerSize = 6
+measurementMarkerSize = 6
+measurementStrokeWidth = 5
+measureLineCurveOffset = 70
+vectorStrokeDash = (5, 5)
+
+
+def getCharacterMapping(font):
+    # fontParts fonts have getCharacterMapping, defcon fonts have unicodeData
+    if hasattr(font, "getCharacterMapping"):
+        return font.getCharacterMapping()
+    return dict(font.unicodeData)
+
+
+# render node -> the names of its pools
+renderNodePools = dict(
+    preview=("preview",),
+    sources=("sources",),
+    onCurveVectors=("onCurveVectors",),
+    offCurveVectors=("offCurveVectors",),
+    previewMarkers=("previewMarkers",),
+    sourceMarkers=("sourceMarkers",),
+    measurements=("measurementJumpers", "measurementMarkers", "measurementText"),
+    previewLine=("previewLine",),
+)
+renderPoolNames = tuple(name for names in renderNodePools.values() for name in names)
+
+# the settings of the panel when it opens
+defaultRenderSettings = dict(
+    showPreview=True,
+    showSources=True,
+    centerPreview=True,
+    showOnCurveVectors=True,
+    showOffCurveVectors=True,
+    showMeasurements=True,
+    showMarkers=True,
+    previewText="",
+)
+
+
+class PreviewRenderer:
+    # The overlays of one glyph editor, for LongboardEditorView and the session replay.
+    # Each overlay is a render node that is only drawn again when its inputs change.
+    # A redraw is done in three steps:
+    # prepare collects what needs the fonts and the operator, on the main thread,
+    # compute makes the geometry, no layers and no fonts are touched so it can run in a render thread,
+    # apply puts the geometry in the layers of the changed render nodes, on the main thread.
+    # render does the three in one go.
+    # pools: {name: SublayerPool} for the names in renderPoolNames.
+    # The renderer is the holder of its previews in the InterpolationService.
+    def __init__(self, service, pools, hazeValue=.16, batchRendering=True,
+            detailLevels=LevelOfDetail.defaultLevels, frameBudget=1/60, dragMarkerStep=2):
+        self.service = service
+        self.pools = pools
+        self.nodes = {name: RenderNode(name, [pools[poolName] for poolName in poolNames]) for name, poolNames in renderNodePools.items()}
+        self.settings = dict(defaultRenderSettings)
+        self.colors = makeOverlayColors(hazeValue)
+        self.batchRendering = batchRendering
+        # the level of detail while the navigator drags
+        self.detail = LevelOfDetail(detailLevels, frameBudget)
+        self.dragMarkerStep = dragMarkerStep
+        # bumped when the glyph data changes underneath the render nodes
+        self.generation = 0
+
+    def changeSettings(self, settings):
+        # the settings that are not for the renderer are ignored
+        # returns True when the overlays have to be drawn again
+        redraw = False
+        for key, value in settings.items():
+            if key in self.settings:
+                self.settings[key] = value
+                redraw = True
+        if "hazeValue" in settings:
+            redraw = self.setHazeValue(settings['hazeValue']) or redraw
+        return redraw
+
+    def setHazeValue(self, hazeValue):
+        # the haze value only changes the colors, the existing layers are recolored in place
+        colors = makeOverlayColors(hazeValue)
+        colorMap = {self.colors[name]: colors[name] for name in colors}
+        self.colors = colors
+        for pool in self.pools.values():
+            pool.recolor(colorMap)
+        if self.batchRendering:
+            return False
+        # the separate symbol layers keep their color in the image settings
+        self.nodes["previewMarkers"].invalidate()
+        self.nodes["sourceMarkers"].invalidate()
+        self.nodes["measurements"].invalidate()
+        return True
+
+    def hide(self):
+        # hide all overlays, returns the number of nodes that were showing something
+        hidden = 0
+        for node in self.nodes.values():
+            if node.isDirty(False):
+                node.begin()
+                node.end(False)
+                hidden += 1
+        return hidden
+
+    def getRenderInputs(self, operator, editorGlyph, editorPen, continuousLocation, discreteLocation, previewLocation, beams, reducingDetail=False):
+        # what each render node depends on, False for the hidden ones
+        settings = self.settings
+        glyphKey = (id(operator), editorGlyph.name, self.generation, locationKey(discreteLocation),
+            editorGlyph.width, settings['centerPreview'])
+        previewKey = glyphKey + (locationKey(previewLocation),)
+        sourcesKey = glyphKey + (locationKey(continuousLocation),)
+        editorKey = editorPen.coordinates.tobytes(), editorPen.pointTypes.tobytes()
+        showVectors = settings['showSources'] or settings['showOnCurveVectors']
+        showOnCurveVectors = showVectors and settings['showOnCurveVectors']
+        showOffCurveVectors = showVectors and settings['showOffCurveVectors']
+        showVectorMarkers = settings['showMarkers'] and (showOnCurveVectors or showOffCurveVectors)
+        inputs = dict(
+            preview=settings['showPreview'] and previewKey,
+            sources=settings['showSources'] and sourcesKey,
+            onCurveVectors=showOnCurveVectors and (sourcesKey, editorKey),
+            offCurveVectors=showOffCurveVectors and (sourcesKey, editorKey),
+            previewMarkers=settings['showPreview'] and previewKey,
+            sourceMarkers=showVectorMarkers and (sourcesKey, editorKey, showOnCurveVectors, showOffCurveVectors),
+            measurements=settings['showMeasurements'] and (previewKey, tuple(beams)),
+            previewLine=settings['showPreview'] and settings['previewText'] and (previewKey, settings['previewText']),
+        )
+        inputs = {name: value or False for name, value in inputs.items()}
+        if reducingDetail:
+            # while dragging only the nodes of the current level of detail are drawn.
+            # the others keep what they show if it is still right, otherwise they are hidden.
+            keep = self.detail.nodes
+            if self.dragMarkerStep:
+                inputs['previewMarkers'] = inputs['previewMarkers'] and (inputs['previewMarkers'], self.dragMarkerStep)
+            else:
+                keep = keep - {"previewMarkers"}
+            for name, node in self.nodes.items():
+                if name not in keep and node.isDirty(inputs[name]):
+                    inputs[name] = False
+        return inputs
+
+    def prepare(self, operator, locationIndex, editorGlyph, previewLocation, beams=(), reducingDetail=False):
+        # main thread: the editor glyph, the locations and everything that comes from the operator
+        # locationIndex is the SourceLocationIndex of the operator, beams: [((x1, y1), (x2, y2))]
+        service = self.service
+        editorPen = ArrayCollectorPen(glyphSet=editorGlyph.font)
+        editorGlyph.draw(editorPen)
+        continuousLocation, discreteLocation = locationIndex.getSourceLocations(editorGlyph.font.path)
+        inputs = self.getRenderInputs(operator, editorGlyph, editorPen, continuousLocation, discreteLocation, previewLocation, beams, reducingDetail)
+        dirty = [name for name, node in self.nodes.items() if node.isDirty(inputs[name])]
+        visible = set(name for name in dirty if inputs[name])
+        request = dict(
+            inputs=inputs,
+            dirty=dirty,
+            visible=visible,
+            started=time.perf_counter(),
+            reducedDetail=reducingDetail,
+            markerStep=self.dragMarkerStep if reducingDetail and self.dragMarkerStep else 1,
+            editorPen=editorPen,
+            editorWidth=editorGlyph.width,
+            continuousLocation=continuousLocation,
+            location=dict(previewLocation),
+            beams=list(beams),
+            centerAllGlyphs=self.settings['centerPreview'],
+            showOnCurveVectors=self.settings['showOnCurveVectors'],
+            showOffCurveVectors=self.settings['showOffCurveVectors'],
+            model=None,
+            instanceKey=None,
+            coordinates=None,
+            mathGlyph=None,
+            items=None,
+            incompatibleSources=set(),
+            lineGlyphNames=None,
+            lineModels={},
+            lineMathGlyphs={},
+        )
+        if visible & {"preview", "previewMarkers", "measurements"}:
+            model = service.getInterpolationModel(operator, editorGlyph.name, discreteLocation, locationIndex)
+            if model is not None:
+                # the instance may already be calculated for another editor
+                request['model'] = model
+                request['instanceKey'] = service.cache.makeKey("instance", operator, editorGlyph.name, discreteLocation, previewLocation)
+                request['coordinates'] = service.get(self, request['instanceKey'])
+            else:
+                request['mathGlyph'] = service.makePreviewMathGlyph(self, operator, editorGlyph.name, discreteLocation, previewLocation)
+        if visible & {"sources", "onCurveVectors", "offCurveVectors", "sourceMarkers"}:
+            request['items'] = service.collectSourceItems(operator, editorGlyph.name, discreteLocation)
+            if visible & {"onCurveVectors", "offCurveVectors", "sourceMarkers"}:
+                editorSignature = service.signatures.signature(editorGlyph.font, editorGlyph.name, glyph=editorGlyph)
+                request['incompatibleSources'] = service.signatures.incompatibleSources(operator, request['items'], editorSignature)
+        if "previewLine" in visible:
+            font = editorGlyph.font
+            glyphNames = glyphNamesForText(self.settings['previewText'], getCharacterMapping(font))
+            request['lineGlyphNames'] = [name for name in glyphNames if name in font]
+            request['lineModels'], request['lineMathGlyphs'] = service.getBatchModels(operator, request['lineGlyphNames'], discreteLocation, previewLocation, locationIndex)
+        return request
+
+    def makePreviewPen(self, model, coordinates, location, mathGlyph=None, centerWidth=None):
+        # the preview outline straight from the compiled model if the sources allow it, otherwise
+        # from the mathglyph of the operator. When there is a centerWidth the preview is centered
+        # on it in the same pass. This can run outside the main thread: there is no glyph at all.
+        if model is not None:
+            if coordinates is None:
+                coordinates = self.service.makeInstance(model, location)
+            if coordinates is not None:
+                with pipelineTimer.span("outline"):
+                    shift = 0
+                    if centerWidth is not None:
+                        shift = .5*centerWidth-.5*float(model.getWidth(coordinates))
+                    return model.makePen(coordinates, shift=(shift, 0)), coordinates
+        if mathGlyph is None:
+            return None, None
+        with pipelineTimer.span("outline"):
+            shift = 0
+            if centerWidth is not None:
+                shift = .5*centerWidth-.5*mathGlyph.width
+            return makeOutlinePen(mathGlyph, shift=(shift, 0)), None
+
+    def compute(self, request):
+        # the geometry for the dirty render nodes, no layers and no fonts are touched here
+        with pipelineTimer.span("computeRender"):
+            result = dict(preview=None, sources=[], onCurveVectors=[], offCurveVectors=[], measurements=None, previewLine=[])
+            visible = request['visible']
+            editorWidth = request['editorWidth']
+            if request['model'] is not None or request['mathGlyph'] is not None:
+                centerWidth = editorWidth if request['centerAllGlyphs'] else None
+                previewPen, coordinates = self.makePreviewPen(request['model'], request['coordinates'], request['location'], request['mathGlyph'], centerWidth)
+                result['coordinates'] = coordinates
+                if previewPen is not None:
+                    result['preview'] = previewPen, previewPen.onCurves
+                    if "measurements" in visible:
+                        with pipelineTimer.span("measureBeams"):
+                            result['measurements'] = measureBeams(request['beams'], previewPen, measureLineCurveOffset)
+            if request['lineGlyphNames'] is not None:
+                # the line starts after the glyph in the editor
+                with pipelineTimer.span("previewLine"):
+                    instances = makeInstancesAtLocation(request['lineModels'], request['location'])
+                    result['previewLine'] = makeLinePens(request['lineGlyphNames'], request['lineModels'], instances, request['lineMathGlyphs'], start=editorWidth)
+            if request['items'] is not None:
+                sourcePens = []
+                for loc, srcMath, info in request['items']:
+                    # do not draw the master we're drawing in
+                    if loc == request['continuousLocation']:
+                        continue
+                    shift = 0
+                    if request['centerAllGlyphs']:
+                        shift = .5*editorWidth-.5*srcMath.width
+                    with pipelineTimer.span("outline"):
+                        sourcePen = makeOutlinePen(srcMath, shift=(shift, 0))
+                    if info['source'] not in request['incompatibleSources']:
+                        # the points of incompatible sources are not paired
+                        sourcePens.append(sourcePen)
+                    pathKey = sourcePen.coordinates.tobytes(), sourcePen.pointTypes.tobytes()
+                    result['sources'].append((sourcePen, pathKey))
+                result['onCurveVectors'], result['offCurveVectors'] = pairVectors(request['editorPen'], sourcePens,
+                    onCurves=request['showOnCurveVectors'],
+                    offCurves=request['showOffCurveVectors'])
+        return result
+
+    def apply(self, request, result):
+        # main thread: put the finished geometry in the layers of the dirty render nodes
+        dirty = request['dirty']
+        visible = request['visible']
+        colors = self.colors
+        pools = self.pools
+        if request['instanceKey'] is not None and result.get('coordinates') is not None:
+            # share the instance with the other editors
+            self.service.get(self, request['instanceKey'], lambda: result['coordinates'])
+        created = sum(pool.created for pool in pools.values())
+        for name in dirty:
+            self.nodes[name].begin()
+        built = None
+        try:
+            with pipelineTimer.span("layers"):
+                if result['preview'] is not None:
+                    previewPen, previewOnCurves = result['preview']
+                    if "preview" in visible:
+                        layer = pools['preview'].appendPathSublayer(
+                            fillColor=colors['previewFillColor'],
+                            strokeColor=colors['previewStrokeColor'],
+                            strokeWidth=1)
+                        previewPen.replay(layer.getPen(clear=True))
+                    if "previewMarkers" in visible:
+                        self.drawMarkers(pools['previewMarkers'], previewOnCurves[::request['markerStep']], previewMarkerSize, colors['previewStrokeColor'])
+                if result['measurements'] is not None:
+                    self.drawMeasurements(*result['measurements'])
+                if "sources" in visible:
+                    for sourcePen, pathKey in result['sources']:
+                        # the pen has the centering shift already
+                        layer = pools['sources'].appendPathSublayer(
+                            fillColor=None,
+                            strokeColor=colors['sourceStrokeColor'],
+                            strokeWidth=1)
+                        if pools['sources'].pathChanged(layer, pathKey):
+                            sourcePen.replay(layer.getPen(clear=True))
+                if "onCurveVectors" in visible:
+                    self.drawVectors(pools['onCurveVectors'], result['onCurveVectors'])
+                if "offCurveVectors" in visible:
+                    self.drawVectors(pools['offCurveVectors'], result['offCurveVectors'])
+                if "sourceMarkers" in visible:
+                    self.drawMarkers(pools['sourceMarkers'], [b for a, b in result['onCurveVectors'] + result['offCurveVectors']], markerSize, colors['sourceStrokeColor'])
+                if "previewLine" in visible:
+                    for linePen in result['previewLine']:
+                        layer = pools['previewLine'].appendPathSublayer(
+                            fillColor=colors['previewFillColor'],
+                            strokeColor=colors['previewStrokeColor'],
+                            strokeWidth=1)
+                        linePen.replay(layer.getPen(clear=True))
+            built = request['inputs']
+        finally:
+            # a node that failed halfway is drawn again next time
+            for name in dirty:
+                self.nodes[name].end(built[name] if built is not None else None)
+        if request['reducedDetail']:
+            # the whole frame, with the time in the render thread
+            self.detail.frameDidFinish(time.perf_counter() - request['started'])
+        if pipelineTimer.enabled:
+            pipelineTimer.count("detail level", self.detail.level if request['reducedDetail'] else 0)
+            pipelineTimer.count("layers created", sum(pool.created for pool in pools.values()) - created)
+            pipelineTimer.count("layers used", self.layersUsed())
+            pipelineTimer.count("incompatible sources", len(request['incompatibleSources']))
+
+    def render(self, operator, locationIndex, editorGlyph, previewLocation, beams=(), reducingDetail=False):
+        # prepare, compute and apply in one go, returns the request
+        request = self.prepare(operator, locationIndex, editorGlyph, previewLocation, beams, reducingDetail)
+        if request['dirty']:
+            self.apply(request, self.compute(request))
+        return request
+
+    def layersUsed(self):
+        return sum(sum(pool.used.values()) for pool in self.pools.values())
+
+    def drawMeasurements(self, jumpers, markerPoints, labels):
+        colors = self.colors
+        for textPos, text in labels:
+            textLayer = self.pools['measurementText'].appendTextLineSublayer(
+                position=textPos,
+                pointSize=10,
+                fillColor=(1,1,1,1),
+                backgroundColor=colors['measurementFillColor'],
+                horizontalAlignment="center",
+                cornerRadius=6,
+                padding=(3, 1)
+                )
+            textLayer.setText(text)
+        if self.batchRendering:
+            appendJumpersLayer(self.pools['measurementJumpers'], jumpers,
+                strokeColor=colors['measurementStrokeColor'],
+                strokeWidth=measurementStrokeWidth)
+            appendMarkersLayer(self.pools['measurementMarkers'], markerPoints,
+                size=measurementMarkerSize,
+                fillColor=colors['measurementFillColor'])
+            return
+        for jumper in jumpers:
+            jumperLayer = self.pools['measurementJumpers'].appendPathSublayer(
+                strokeWidth=measurementStrokeWidth,
+                strokeColor=colors['measurementStrokeColor'],
+                fillColor=None,
+            )
+            jumperPen = jumperLayer.getPen(clear=True)
+            jumperPen.moveTo(jumper[0])
+            jumperPen.curveTo(*jumper[1:])
+            jumperPen.endPath()
+        self.drawMarkers(self.pools['measurementMarkers'], markerPoints, measurementMarkerSize, colors['measurementFillColor'])
+
+    def drawVectors(self, pool, vectors):
+        # vectors: list of (startPoint, endPoint)
+        if self.batchRendering:
+            appendVectorsLayer(pool, vectors,
+                strokeColor=self.colors['vectorStrokeColor'],
+                strokeWidth=1,
+                strokeDash=vectorStrokeDash)
+            return
+        for a, b in vectors:
+            pool.appendLineSublayer(
+                startPoint=a,
+                endPoint=b,
+                strokeWidth=1,
+                strokeColor=self.colors['vectorStrokeColor'],
+                strokeDash=vectorStrokeDash,
+            )
+
+    def drawMarkers(self, container, points, size, fillColor):
+        if self.batchRendering:
+            appendMarkersLayer(container, points, size=size, fillColor=fillColor)
+            return
+        for pt in points:
+            symbolLayer = container.appendSymbolSublayer(position=pt)
+            symbolLayer.setImageSettings(
+                dict(
+                    name="oval",
+                    size=(size, size),
+                    fillColor=fillColor
+                    )
+                )
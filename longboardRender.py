@@ -0,0 +1,296 @@
+# Render the Longboard overlays for a whole designspace, without RoboFont.
+#
+# For every glyph this draws what the glyph editor shows on top of the default source:
+# the preview at a location, the other sources, the on- and off-curve vectors
+# from the default source to the other sources, and the measurements along the beams.
+# Each glyph goes in its own SVG, or many glyphs go on one contact sheet.
+# The glyphs are spread over a process pool, every worker reads the designspace once.
+#
+#   python longboardRender.py family.designspace --output renders
+#   python longboardRender.py family.designspace --location weight=600 --beam 0,500,2000,500 --sheet 48 --output renders
+#
+# A beam that starts with a negative number looks like an option to argparse, write it with an =:
+#   python longboardRender.py family.designspace --beam=-100,500,2000,500
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from fontTools.pens.svgPathPen import SVGPathPen
+from ufoProcessor.ufoOperator import UFOOperator
+
+from longboardCore import (
+    ArrayCollectorPen,
+    SourceLocationIndex,
+    DecomposedOutlineCache,
+    GlyphInterpolationModel,
+    StructureSignatureIndex,
+    makeOutlinePen,
+    pairVectors,
+    measureBeams,
+    makeOverlayColors,
+    markerSize,
+    previewMarkerSize,
+    measurementMarkerSize,
+    measurementStrokeWidth,
+    measureLineCurveOffset,
+    vectorStrokeDash,
+)
+
+
+def svgColor(color):
+    if color is None:
+        return "none"
+    r, g, b, a = color
+    return f"rgba({round(r*255)},{round(g*255)},{round(b*255)},{a:g})"
+
+
+def svgNumber(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def svgPoints(points):
+    return " ".join(f"{svgNumber(x)} {svgNumber(y)}" for x, y in points)
+
+
+# the worker processes keep their operator between glyphs
+_worker = {}
+
+def initWorker(designspacePath, location, beams, options):
+    operator = UFOOperator(designspacePath)
+    operator.loadFonts()
+    index = SourceLocationIndex(operator)
+    if location is None:
+        location = dict(operator.newDefaultLocation())
+    continuousLocation, discreteLocation = operator.splitLocation(location)
+    defaultSource = operator.findDefault()
+    defaultLocation, defaultDiscreteLocation = operator.splitLocation(defaultSource.location)
+    _worker.update(
+        operator=operator,
+        axisExtremes=index.getAxisExtremes(),
+        location=location,
+        discreteLocation=discreteLocation or None,
+        defaultLocation=defaultLocation,
+        defaultFont=operator.findDefaultFont(),
+        decomposed=DecomposedOutlineCache(),
+        signatures=StructureSignatureIndex(),
+        beams=beams,
+        options=options,
+    )
+
+
+def collectOverlays(glyphName):
+    # the same overlays as PreviewRenderer.compute, for the default source
+    # returns None if the glyph is not in the default source
+    operator = _worker['operator']
+    options = _worker['options']
+    defaultFont = _worker['defaultFont']
+    if glyphName not in defaultFont:
+        return None
+    # the base glyphs are decomposed once per worker, not again for every composite
+    items, unicodes = operator.collectSourcesForGlyph(glyphName, decomposeComponents=False, discreteLocation=_worker['discreteLocation'])
+    items = _worker['decomposed'].decomposeSourceItems(operator, items)
+    # the default source stands in for the glyph in the editor
+    editorGlyph = defaultFont[glyphName]
+    editorPen = ArrayCollectorPen(glyphSet=defaultFont)
+    editorGlyph.draw(editorPen)
+    editorPath = SVGPathPen(defaultFont)
+    editorGlyph.draw(editorPath)
+    editorWidth = editorGlyph.width
+    # like the editor, the points of sources with a different structure are not paired
+    editorSignature = _worker['signatures'].signature(defaultFont, glyphName, glyph=editorGlyph)
+    incompatibleSources = _worker['signatures'].incompatibleSources(operator, items, editorSignature)
+    overlays = dict(glyphName=glyphName, width=editorWidth, editor=editorPath.getCommands(),
+        preview=None, previewOnCurves=[], sources=[], onCurveVectors=[], offCurveVectors=[], measurements=None)
+
+    # the preview, with the compiled model if the sources allow it
+    previewPen = None
+    model = GlyphInterpolationModel.fromSourceItems(items, _worker['axisExtremes'])
+    if model is not None:
+        coordinates = model.makeInstance(_worker['location'])
+        if coordinates is not None:
+            previewWidth = float(model.getWidth(coordinates))
+            shift = .5*editorWidth - .5*previewWidth if options['center'] else 0
+            previewPen = model.makePen(coordinates, shift=(shift, 0))
+    if previewPen is None:
+        mathGlyph = operator.makeOneGlyph(glyphName, location=_worker['location'])
+        if mathGlyph is not None:
+            shift = .5*editorWidth - .5*mathGlyph.width if options['center'] else 0
+            previewPen = makeOutlinePen(mathGlyph, shift=(shift, 0))
+    if previewPen is not None:
+        previewPath = SVGPathPen(None)
+        previewPen.replay(previewPath)
+        overlays['preview'] = previewPath.getCommands()
+        overlays['previewOnCurves'] = previewPen.onCurves
+        if _worker['beams']:
+            overlays['measurements'] = measureBeams(_worker['beams'], previewPen, measureLineCurveOffset)
+
+    # the other sources and the vectors to them
+    sourcePens = []
+    for loc, srcMath, info in items:
+        if loc == _worker['defaultLocation']:
+            continue
+        shift = .5*editorWidth - .5*srcMath.width if options['center'] else 0
+        sourcePen = makeOutlinePen(srcMath, shift=(shift, 0))
+        if info['source'] not in incompatibleSources:
+            sourcePens.append(sourcePen)
+        sourcePath = SVGPathPen(None)
+        sourcePen.replay(sourcePath)
+        overlays['sources'].append(sourcePath.getCommands())
+    overlays['onCurveVectors'], overlays['offCurveVectors'] = pairVectors(editorPen, sourcePens)
+    return overlays
+
+
+def makeGlyphGroup(overlays, colors, top):
+    # the svg elements for one glyph, in glyph coordinates with y up
+    # text is placed outside the flipped group so it reads the right way up
+    shapes = []
+    shapes.append(f'<path d="{overlays["editor"]}" fill="none" stroke="black" stroke-width="1"/>')
+    if overlays['preview'] is not None:
+        shapes.append(f'<path d="{overlays["preview"]}" fill="{svgColor(colors["previewFillColor"])}" stroke="{svgColor(colors["previewStrokeColor"])}" stroke-width="1"/>')
+    for d in overlays['sources']:
+        shapes.append(f'<path d="{d}" fill="none" stroke="{svgColor(colors["sourceStrokeColor"])}" stroke-width="1"/>')
+    vectors = overlays['onCurveVectors'] + overlays['offCurveVectors']
+    if vectors:
+        d = " ".join(f"M{svgPoints([a])} L{svgPoints([b])}" for a, b in vectors)
+        shapes.append(f'<path d="{d}" fill="none" stroke="{svgColor(colors["vectorStrokeColor"])}" stroke-width="1" stroke-dasharray="{svgPoints([vectorStrokeDash])}"/>')
+    for pt in [b for a, b in vectors]:
+        shapes.append(f'<circle cx="{svgNumber(pt[0])}" cy="{svgNumber(pt[1])}" r="{svgNumber(.5*markerSize)}" fill="{svgColor(colors["sourceStrokeColor"])}"/>')
+    for pt in overlays['previewOnCurves']:
+        shapes.append(f'<circle cx="{svgNumber(pt[0])}" cy="{svgNumber(pt[1])}" r="{svgNumber(.5*previewMarkerSize)}" fill="{svgColor(colors["previewStrokeColor"])}"/>')
+    labels = []
+    if overlays['measurements'] is not None:
+        jumpers, markerPoints, measurementLabels = overlays['measurements']
+        for jumper in jumpers:
+            shapes.append(f'<path d="M{svgPoints(jumper[:1])} C{svgPoints(jumper[1:])}" fill="none" stroke="{svgColor(colors["measurementStrokeColor"])}" stroke-width="{measurementStrokeWidth}"/>')
+        for pt in markerPoints:
+            shapes.append(f'<circle cx="{svgNumber(pt[0])}" cy="{svgNumber(pt[1])}" r="{svgNumber(.5*measurementMarkerSize)}" fill="{svgColor(colors["measurementFillColor"])}"/>')
+        for (x, y), text in measurementLabels:
+            labels.append(f'<text x="{svgNumber(x)}" y="{svgNumber(top - y)}" font-size="10" text-anchor="middle" fill="{svgColor(colors["measurementStrokeColor"])}">{escape(text)}</text>')
+    flipped = f'<g transform="matrix(1 0 0 -1 0 {svgNumber(top)})">' + "".join(shapes) + "</g>"
+    return flipped + "".join(labels)
+
+
+def renderGlyph(glyphName):
+    # runs in a worker: returns (glyphName, svg group, cell width) or None
+    overlays = collectOverlays(glyphName)
+    if overlays is None:
+        return None
+    options = _worker['options']
+    top = options['top']
+    group = makeGlyphGroup(overlays, makeOverlayColors(options['haze']), top)
+    return glyphName, group, max(overlays['width'], options['minimumWidth'])
+
+
+def writeSVG(path, width, height, body):
+    with open(path, "w") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{svgNumber(width)}" height="{svgNumber(height)}" viewBox="0 0 {svgNumber(width)} {svgNumber(height)}">')
+        f.write('<rect width="100%" height="100%" fill="white"/>')
+        f.write(body)
+        f.write("</svg>\n")
+
+
+def safeFileName(glyphName):
+    # glyph names can differ only in case, like the ufo spec this marks the capitals
+    name = "".join(c + "_" if c.isupper() else c for c in glyphName)
+    return "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+
+
+def parseLocation(text):
+    # "weight=600,width=100" -> {"weight": 600.0, "width": 100.0}
+    location = {}
+    for part in text.split(","):
+        name, value = part.split("=")
+        location[name.strip()] = float(value)
+    return location
+
+
+def parseBeam(text):
+    x1, y1, x2, y2 = [float(v) for v in text.split(",")]
+    return (x1, y1), (x2, y2)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Render the Longboard overlays for all glyphs in a designspace.")
+    parser.add_argument("designspace", help="path to the .designspace file")
+    parser.add_argument("--output", default="longboardRenders", help="folder for the svg files")
+    parser.add_argument("--glyphs", help="comma separated glyph names. Default: all glyphs in the default source")
+    parser.add_argument("--location", help="preview location, for instance weight=600,width=100. Default: the default location")
+    parser.add_argument("--beam", action="append", default=[], help="measuring beam x1,y1,x2,y2, can be repeated. Write --beam=-100,500,2000,500 when it starts with a negative number")
+    parser.add_argument("--sheet", type=int, default=0, help="put this many glyphs on each contact sheet. Default: one svg per glyph")
+    parser.add_argument("--columns", type=int, default=8, help="number of columns on a contact sheet")
+    parser.add_argument("--haze", type=float, default=.5, help="opacity of the overlays")
+    parser.add_argument("--no-center", action="store_true", help="do not center the preview and the sources on the default source")
+    parser.add_argument("--workers", type=int, help="number of processes. Default: the number of cpus")
+    options = parser.parse_args(args)
+
+    operator = UFOOperator(options.designspace)
+    operator.loadFonts()
+    defaultFont = operator.findDefaultFont()
+    if defaultFont is None:
+        print("no default source found", file=sys.stderr)
+        return 1
+    if options.glyphs:
+        glyphNames = [name.strip() for name in options.glyphs.split(",")]
+    else:
+        glyphNames = [name for name in defaultFont.glyphOrder if name in defaultFont]
+        glyphNames += sorted(name for name in defaultFont.keys() if name not in glyphNames)
+    unitsPerEm = defaultFont.info.unitsPerEm or 1000
+    ascender = defaultFont.info.ascender if defaultFont.info.ascender is not None else .75*unitsPerEm
+    descender = defaultFont.info.descender if defaultFont.info.descender is not None else -.25*unitsPerEm
+    margin = .2*unitsPerEm
+    renderOptions = dict(
+        haze=options.haze,
+        center=not options.no_center,
+        top=ascender + margin,
+        minimumWidth=.5*unitsPerEm,
+    )
+    height = ascender - descender + 2*margin
+    location = parseLocation(options.location) if options.location else None
+    beams = [parseBeam(text) for text in options.beam]
+    os.makedirs(options.output, exist_ok=True)
+
+    written = 0
+    sheet = []
+    sheetIndex = 0
+
+    def writeSheet():
+        nonlocal sheetIndex, written
+        cellWidth = max(width for name, group, width in sheet) + 2*margin
+        columns = min(options.columns, len(sheet))
+        rows = (len(sheet) + columns - 1) // columns
+        body = []
+        for i, (name, group, width) in enumerate(sheet):
+            x = (i % columns) * cellWidth + margin
+            y = (i // columns) * (height + 40)
+            body.append(f'<g transform="translate({svgNumber(x)} {svgNumber(y)})">{group}<text x="0" y="{svgNumber(height + 20)}" font-size="24">{escape(name)}</text></g>')
+        writeSVG(os.path.join(options.output, f"sheet_{sheetIndex:04d}.svg"), columns*cellWidth, rows*(height + 40), "".join(body))
+        sheetIndex += 1
+        written += 1
+        del sheet[:]
+
+    with ProcessPoolExecutor(max_workers=options.workers, initializer=initWorker,
+            initargs=(os.path.abspath(options.designspace), location, beams, renderOptions)) as executor:
+        # map keeps the glyph order, so the sheets follow the glyph order of the font
+        for result in executor.map(renderGlyph, glyphNames, chunksize=16):
+            if result is None:
+                continue
+            name, group, width = result
+            if options.sheet:
+                sheet.append(result)
+                if len(sheet) == options.sheet:
+                    writeSheet()
+            else:
+                writeSVG(os.path.join(options.output, safeFileName(name) + ".svg"), width + 2*margin, height,
+                    f'<g transform="translate({svgNumber(margin)} 0)">{group}</g>')
+                written += 1
+    if sheet:
+        writeSheet()
+    print(f"wrote {written} svg files for {len(glyphNames)} glyphs to {options.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
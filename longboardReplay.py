@@ -0,0 +1,217 @@
+# Play back a recorded Longboard session without RoboFont.
+#
+# Record a session with "Record Session" in the Longboard panel: the navigator drags,
+# the settings, the preview locations and the glyphs go in a file, one event per line.
+# This replays the events with the PreviewRenderer from longboardCore that LongboardEditorView
+# uses: the compiled models, the decomposed sources, the render nodes and the layer pools,
+# with stand-ins for merz. It reports the latency of each kind of event as percentiles
+# and the number of layers that were made.
+#
+#   python longboardReplay.py session.jsonl
+#   python longboardReplay.py session.jsonl --designspace family.designspace --output replay.json
+#   python longboardReplay.py session.jsonl --model-cache models
+
+import argparse
+import json
+import math
+import sys
+import time
+
+from ufoProcessor.ufoOperator import UFOOperator
+
+from longboardCore import (
+    SourceLocationIndex,
+    InterpolationService,
+    ModelDiskCache,
+    SublayerPool,
+    CountingContainer,
+    PreviewRenderer,
+    renderPoolNames,
+    readSession,
+)
+
+
+class ReplayEditor:
+    # One glyph editor: the PreviewRenderer of LongboardEditorView with stand-in layers,
+    # so only the overlays whose inputs changed are made again.
+    # The geometry is made and applied in one go, there is no render thread.
+    # The recording has no idle events, the detail is reduced for the whole drag.
+    def __init__(self, operator, diskCache=None):
+        self.operator = operator
+        self.index = SourceLocationIndex(operator)
+        self.fontsByPath = {font.path: font for font in operator.fonts.values() if font.path}
+        self.container = CountingContainer()
+        self.service = InterpolationService()
+        self.service.diskCache = diskCache
+        pools = {name: SublayerPool(self.container) for name in renderPoolNames}
+        self.renderer = PreviewRenderer(self.service, pools)
+        self.service.register(self.renderer)
+        self.glyph = None
+        self.location = None
+        self.dragging = False
+        self.redraws = 0
+        self.handlers = dict(
+            session=self.startSession,
+            glyph=self.setGlyph,
+            settings=self.changeSettings,
+            previewLocation=self.setPreviewLocation,
+            navigator=self.navigate,
+            navigatorActive=self.startDrag,
+            navigatorInactive=self.endDrag,
+            sourceGlyphChanged=self.sourceGlyphChanged,
+        )
+
+    def handle(self, event):
+        # False for events this version does not know
+        handler = self.handlers.get(event['event'])
+        if handler is None:
+            return False
+        handler(event)
+        return True
+
+    def close(self):
+        self.service.unregister(self.renderer)
+
+    # events
+
+    def startSession(self, event):
+        pass
+
+    def setGlyph(self, event):
+        font = self.fontsByPath.get(event.get('fontPath'))
+        if font is None:
+            font = self.operator.findDefaultFont()
+        glyphName = event['glyphName']
+        if font is None or glyphName not in font:
+            self.glyph = None
+        else:
+            beams = [(tuple(a), tuple(b)) for a, b in event.get('beams', [])]
+            self.glyph = font[glyphName], beams
+        self.redraw()
+
+    def changeSettings(self, event):
+        if self.renderer.changeSettings(event):
+            self.redraw()
+
+    def setPreviewLocation(self, event):
+        self.location = dict(event['location'])
+        self.redraw()
+
+    def navigate(self, event):
+        # the preview location that follows from the drag is its own event
+        pass
+
+    def startDrag(self, event):
+        self.dragging = True
+        self.renderer.detail.reset()
+
+    def endDrag(self, event):
+        self.dragging = False
+        self.redraw()
+
+    def sourceGlyphChanged(self, event):
+        # like LongboardEditorView.invalidateGlyph
+        names = self.service.glyphChanged(event['glyphName'])
+        for name in names:
+            self.operator.glyphChanged(name)
+        self.renderer.generation += 1
+        self.redraw()
+
+    def redraw(self):
+        if self.glyph is None or self.location is None:
+            if self.renderer.hide():
+                self.redraws += 1
+            return
+        editorGlyph, beams = self.glyph
+        request = self.renderer.render(self.operator, self.index, editorGlyph, self.location, beams, reducingDetail=self.dragging)
+        if request['dirty']:
+            self.redraws += 1
+
+    def layersUsed(self):
+        return self.renderer.layersUsed()
+
+
+def percentile(values, p):
+    # nearest rank, values sorted
+    if not values:
+        return 0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarizeLatencies(latencies):
+    # {kind: dict(count, p50, p90, p99, max)} in milliseconds, "all" for all events together
+    latencies = dict(latencies)
+    latencies['all'] = [value for values in latencies.values() for value in values]
+    summary = {}
+    for kind, values in latencies.items():
+        values = sorted(values)
+        summary[kind] = dict(
+            count=len(values),
+            p50=1000*percentile(values, 50),
+            p90=1000*percentile(values, 90),
+            p99=1000*percentile(values, 99),
+            max=1000*values[-1] if values else 0,
+        )
+    return summary
+
+
+def replaySession(events, designspacePath=None, modelCacheDirectory=None):
+    # play the events in order, as fast as they go. Returns the report.
+    # with a modelCacheDirectory the compiled models are kept on disk, like in the editor
+    if designspacePath is None:
+        for event in events:
+            if event['event'] == "session":
+                designspacePath = event.get('designspace')
+                break
+    if designspacePath is None:
+        raise ValueError("the session does not name a designspace, pass one")
+    operator = UFOOperator(designspacePath)
+    operator.loadFonts()
+    diskCache = None
+    if modelCacheDirectory is not None:
+        diskCache = ModelDiskCache(modelCacheDirectory)
+    editor = ReplayEditor(operator, diskCache)
+    latencies = {}
+    skipped = 0
+    for event in events:
+        start = time.perf_counter()
+        handled = editor.handle(event)
+        duration = time.perf_counter() - start
+        if not handled:
+            skipped += 1
+            continue
+        latencies.setdefault(event['event'], []).append(duration)
+    editor.close()
+    return dict(
+        designspace=designspacePath,
+        events=len(events),
+        skipped=skipped,
+        redraws=editor.redraws,
+        layersCreated=editor.container.layerCount,
+        layersUsed=editor.layersUsed(),
+        latency=summarizeLatencies(latencies),
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Longboard session without RoboFont.")
+    parser.add_argument("session", help="a session recorded in the Longboard panel")
+    parser.add_argument("--designspace", help="use this designspace instead of the one in the recording")
+    parser.add_argument("--output", help="write the report to this json file")
+    parser.add_argument("--model-cache", help="keep the compiled models in this folder, like the editor does")
+    options = parser.parse_args(args)
+
+    report = replaySession(readSession(options.session), options.designspace, options.model_cache)
+    print(f"{report['events']} events, {report['skipped']} skipped, {report['redraws']} redraws")
+    print(f"{report['layersCreated']} layers created, {report['layersUsed']} in use at the end")
+    print(f"{'event':<20} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, values in sorted(report['latency'].items()):
+        print(f"{kind:<20} {values['count']:>6} {values['p50']:>9.2f} {values['p90']:>9.2f} {values['p99']:>9.2f} {values['max']:>9.2f}")
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
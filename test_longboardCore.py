@@ -0,0 +1,427 @@
+# Tests for the geometry in longboardCore, they do not need RoboFont.
+#
+#   python -m pytest -q
+#
+# The designspace is made in a temporary folder: three sources on a weight and a width axis,
+# with straight and curved glyphs, a composite and a glyph with incompatible sources.
+
+import math
+import os
+import sys
+import threading
+
+import pytest
+import defcon
+from fontTools.designspaceLib import DesignSpaceDocument
+from fontTools.misc.bezierTools import segmentSegmentIntersections
+from fontTools.pens.recordingPen import RecordingPen
+from ufoProcessor.ufoOperator import UFOOperator
+
+import longboardCore
+from longboardCore import (
+    OutlineSegments,
+    measureBeams,
+    SourceLocationIndex,
+    GlyphInterpolationModel,
+    DecomposedOutlineCache,
+    ModelDiskCache,
+    SublayerPool,
+    InterpolationService,
+    PreviewPrefetcher,
+    makeOutlinePen,
+    appendVectorsLayer,
+    appendMarkersLayer,
+    CountingContainer,
+    PreviewRenderer,
+    renderPoolNames,
+    PipelineTimer,
+)
+
+
+def drawRectangle(pen, x, y, w, h):
+    pen.moveTo((x, y))
+    pen.lineTo((x + w, y))
+    pen.lineTo((x + w, y + h))
+    pen.lineTo((x, y + h))
+    pen.closePath()
+
+def drawOval(pen, x, y, w, h):
+    k = .5523
+    rx, ry = .5*w, .5*h
+    cx, cy = x + rx, y + ry
+    pen.moveTo((cx + rx, cy))
+    pen.curveTo((cx + rx, cy + k*ry), (cx + k*rx, cy + ry), (cx, cy + ry))
+    pen.curveTo((cx - k*rx, cy + ry), (cx - rx, cy + k*ry), (cx - rx, cy))
+    pen.curveTo((cx - rx, cy - k*ry), (cx - k*rx, cy - ry), (cx, cy - ry))
+    pen.curveTo((cx + k*rx, cy - ry), (cx + rx, cy - k*ry), (cx + rx, cy))
+    pen.closePath()
+
+def drawMixed(pen, bulge):
+    # a line in one source, a curve in the others
+    pen.moveTo((0, 0))
+    pen.lineTo((300, 0))
+    if bulge:
+        pen.curveTo((300 + bulge, 200), (300 + bulge, 500), (300, 700))
+    else:
+        pen.lineTo((300, 700))
+    pen.lineTo((0, 700))
+    pen.closePath()
+
+# name, weight, width, stem
+sourceParameters = [
+    ("light", 100, 100, 40),
+    ("bold", 900, 100, 160),
+    ("condensed", 100, 50, 30),
+]
+
+def makeSourceFont(path, weight, width, stem):
+    font = defcon.Font()
+    font.info.unitsPerEm = 1000
+    font.info.ascender = 750
+    font.info.descender = -250
+    scale = width / 100
+    glyph = font.newGlyph("I")
+    glyph.unicodes = [ord("I")]
+    glyph.width = 2*stem + 120*scale
+    drawRectangle(glyph.getPen(), 60*scale, 0, stem, 700)
+    glyph = font.newGlyph("O")
+    glyph.unicodes = [ord("O")]
+    glyph.width = 700*scale
+    pen = glyph.getPen()
+    drawOval(pen, 40*scale, -10, 620*scale, 720)
+    drawOval(pen, (40 + stem)*scale, -10 + .6*stem, (620 - 2*stem)*scale, 720 - 1.2*stem)
+    glyph = font.newGlyph("acute")
+    glyph.width = 300
+    pen = glyph.getPen()
+    pen.moveTo((100, 750))
+    pen.lineTo((100 + stem, 750))
+    pen.lineTo((220 + stem, 900))
+    pen.closePath()
+    glyph = font.newGlyph("Iacute")
+    glyph.width = font["I"].width
+    pen = glyph.getPen()
+    pen.addComponent("I", (1, 0, 0, 1, 0, 0))
+    pen.addComponent("acute", (1, 0, 0, 1, 10*scale, 0))
+    glyph = font.newGlyph("mixed")
+    glyph.width = 500
+    drawMixed(glyph.getPen(), 0 if weight == 100 else stem)
+    glyph = font.newGlyph("bad")
+    glyph.width = 500
+    pen = glyph.getPen()
+    drawRectangle(pen, 0, 0, stem, 700)
+    if weight == 900:
+        drawRectangle(pen, 200, 0, stem, 700)
+    font.save(path)
+
+@pytest.fixture
+def designspacePath(tmp_path):
+    doc = DesignSpaceDocument()
+    doc.addAxisDescriptor(name="weight", tag="wght", minimum=100, default=100, maximum=900)
+    doc.addAxisDescriptor(name="width", tag="wdth", minimum=50, default=100, maximum=100)
+    for name, weight, width, stem in sourceParameters:
+        path = str(tmp_path / f"{name}.ufo")
+        makeSourceFont(path, weight, width, stem)
+        doc.addSourceDescriptor(name=name, filename=f"{name}.ufo", location=dict(weight=weight, width=width))
+    path = str(tmp_path / "test.designspace")
+    doc.write(path)
+    return path
+
+@pytest.fixture
+def operator(designspacePath):
+    operator = UFOOperator(designspacePath)
+    operator.loadFonts()
+    return operator
+
+@pytest.fixture(params=["numpy", "python"])
+def numpyOrNot(request, monkeypatch):
+    # run with and without numpy
+    if request.param == "python":
+        monkeypatch.setattr(longboardCore, "_numpy", None)
+    elif longboardCore.getNumpy() is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+locations = [
+    dict(weight=100, width=100),
+    dict(weight=400, width=100),
+    dict(weight=900, width=100),
+    dict(weight=650, width=75),
+    dict(weight=250, width=50),
+]
+
+def collectItems(operator, glyphName, decomposed=None):
+    items, unicodes = operator.collectSourcesForGlyph(glyphName, decomposeComponents=False)
+    if decomposed is None:
+        decomposed = DecomposedOutlineCache()
+    return decomposed.decomposeSourceItems(operator, items)
+
+def assertPensEqual(pen, other, tolerance=1e-6):
+    assert list(pen.pointTypes) == list(other.pointTypes)
+    assert list(pen.startPoints) == list(other.startPoints)
+    assert list(pen.closed) == list(other.closed)
+    assert len(pen.coordinates) == len(other.coordinates)
+    for a, b in zip(pen.coordinates, other.coordinates):
+        assert abs(a - b) < tolerance
+
+
+# the compiled model
+
+@pytest.mark.parametrize("glyphName", ["I", "O", "Iacute", "mixed"])
+def test_modelMatchesOperator(operator, numpyOrNot, glyphName):
+    axisExtremes = SourceLocationIndex(operator).getAxisExtremes()
+    model = GlyphInterpolationModel.fromSourceItems(collectItems(operator, glyphName), axisExtremes)
+    assert model is not None
+    for location in locations:
+        coordinates = model.makeInstance(location)
+        mathGlyph = operator.makeOneGlyph(glyphName, location=location)
+        assert abs(float(model.getWidth(coordinates)) - mathGlyph.width) < 1e-6
+        assertPensEqual(model.makePen(coordinates, shift=(25, 0)), makeOutlinePen(mathGlyph, shift=(25, 0)))
+
+def test_incompatibleSourcesAreNotCompiled(operator):
+    axisExtremes = SourceLocationIndex(operator).getAxisExtremes()
+    assert GlyphInterpolationModel.fromSourceItems(collectItems(operator, "bad"), axisExtremes) is None
+
+def test_prefetchedInstancesBelongToTheirModel(operator, monkeypatch):
+    # a new model that gets the id of a model that is gone does not pick up its instances
+    axisExtremes = SourceLocationIndex(operator).getAxisExtremes()
+    model = GlyphInterpolationModel.fromSourceItems(collectItems(operator, "I"), axisExtremes)
+    other = GlyphInterpolationModel.fromSourceItems(collectItems(operator, "O"), axisExtremes)
+    prefetcher = PreviewPrefetcher()
+    monkeypatch.setattr(prefetcher, "_key", lambda model, location: tuple(sorted(location.items())))
+    prefetcher._store(model, locations)
+    assert prefetcher.get(model, locations[0]) is not None
+    assert prefetcher.get(other, locations[0]) is None
+    prefetcher.shutdown()
+
+
+# measuring beams
+
+def referenceIntersections(pen, beam):
+    # the intersections of the beam with every segment, from fontTools
+    recording = RecordingPen()
+    pen.replay(recording)
+    hits = []
+    current = first = None
+    for operation, points in recording.value:
+        if operation == "moveTo":
+            current = first = points[0]
+            continue
+        if operation in ("closePath", "endPath"):
+            segment = current, first
+            if operation == "endPath" or current == first:
+                continue
+        elif operation == "lineTo":
+            segment = current, points[0]
+        else:
+            segment = (current,) + tuple(points)
+        current = segment[-1]
+        for hit in segmentSegmentIntersections(beam, segment):
+            if 0 <= hit.t1 <= 1:
+                hits.append((hit.t1, hit.pt))
+    hits.sort()
+    # a beam through an on-curve point hits the segments on both sides
+    unique = []
+    for t, pt in hits:
+        if not unique or math.hypot(pt[0] - unique[-1][0], pt[1] - unique[-1][1]) > 1e-6:
+            unique.append(pt)
+    return unique
+
+beams = [
+    ((-100, 350), (800, 350)),          # horizontal
+    ((350, -100), (350, 800)),          # vertical
+    ((120, -50), (330, 800)),           # along an italic angle of about 14 degrees
+    ((-100, -100), (800, 800)),         # diagonal
+    ((-100, 2000), (800, 2000)),        # misses
+]
+
+def test_beamIntersections(operator, numpyOrNot):
+    pen = makeOutlinePen(operator.makeOneGlyph("O", location=dict(weight=500, width=80)))
+    segments = OutlineSegments(pen)
+    for beam, hits in zip(beams, segments.intersectBeams(beams)):
+        reference = referenceIntersections(pen, beam)
+        assert len(hits) == len(reference)
+        for a, b in zip(hits, reference):
+            assert math.hypot(a[0] - b[0], a[1] - b[1]) < 1e-3
+
+def test_measureItalicBeam(operator, numpyOrNot):
+    # an italic beam drawn from the top down: the measurements follow the beam
+    pen = makeOutlinePen(operator.makeOneGlyph("O", location=dict(weight=500, width=80)))
+    beam = (330, 800), (120, -50)
+    reference = referenceIntersections(pen, beam)
+    jumpers, markerPoints, labels = measureBeams([beam], pen)
+    assert len(labels) == len(reference) - 1 > 0
+    for (position, text), a, b in zip(labels, reference[:-1], reference[1:]):
+        assert text == f"{math.hypot(a[0] - b[0], a[1] - b[1]):3.2f}"
+    assert markerPoints[0][1] > markerPoints[-1][1]
+
+
+# decomposed sources
+
+def test_decomposedComposites(operator):
+    decomposed = DecomposedOutlineCache()
+    items = collectItems(operator, "Iacute", decomposed)
+    reference, unicodes = operator.collectSourcesForGlyph("Iacute", decomposeComponents=True)
+    assert [m.contours for l, m, i in items] == [m.contours for l, m, i in reference]
+    assert "Iacute" in decomposed.dependents("I")
+    assert "Iacute" in decomposed.dependents("acute")
+
+    # change the base glyph, the composite follows after invalidation
+    light = operator.fonts["light"]
+    light["I"].move((0, 50))
+    assert "Iacute" in decomposed.glyphChanged("I", light.path)
+    for name in ("I", "Iacute"):
+        operator.glyphChanged(name)
+    items = collectItems(operator, "Iacute", decomposed)
+    reference, unicodes = operator.collectSourcesForGlyph("Iacute", decomposeComponents=True)
+    assert [m.contours for l, m, i in items] == [m.contours for l, m, i in reference]
+
+
+# the model disk cache
+
+def test_modelDiskCache(operator, tmp_path):
+    axisExtremes = SourceLocationIndex(operator).getAxisExtremes()
+    cache = ModelDiskCache(str(tmp_path / "models"))
+    key = cache.makeKey(operator, "O", None, axisExtremes)
+    assert key is not None
+    assert cache.get(key, axisExtremes) is None
+    sourceVectors = GlyphInterpolationModel.collectSourceVectors(collectItems(operator, "O"), axisExtremes)
+    cache.set(key, sourceVectors)
+    model = cache.get(key, axisExtremes)
+    compiled = GlyphInterpolationModel.fromSourceVectors(*sourceVectors, axisExtremes)
+    for location in locations:
+        assert list(model.makeInstance(location)) == pytest.approx(list(compiled.makeInstance(location)))
+
+    # a saved change to a base glyph changes the key of the composite, not of other glyphs
+    iacuteKey = cache.makeKey(operator, "Iacute", None, axisExtremes)
+    light = operator.fonts["light"]
+    light["I"].move((0, 50))
+    assert cache.makeKey(operator, "Iacute", None, axisExtremes) is None
+    light.save()
+    assert cache.makeKey(operator, "Iacute", None, axisExtremes) not in (None, iacuteKey)
+    assert cache.makeKey(operator, "O", None, axisExtremes) == key
+
+def test_modelDiskCacheKeepsCompositeDependencies(operator, designspacePath, tmp_path):
+    locationIndex = SourceLocationIndex(operator)
+    first = InterpolationService()
+    first.diskCache = ModelDiskCache(str(tmp_path / "models"))
+    assert first.getInterpolationModel(operator, "Iacute", None, locationIndex) is not None
+
+    # a fresh session finds the composite on disk, then a base glyph is edited
+    other = UFOOperator(designspacePath)
+    other.loadFonts()
+    otherIndex = SourceLocationIndex(other)
+    service = InterpolationService()
+    service.diskCache = ModelDiskCache(str(tmp_path / "models"))
+    model = service.getInterpolationModel(other, "Iacute", None, otherIndex)
+    assert service.diskCache.hits == 1
+    light = other.fonts["light"]
+    light["I"].move((0, 50))
+    names = service.glyphChanged("I", light.path)
+    assert "Iacute" in names
+    for name in names:
+        other.glyphChanged(name)
+    recompiled = service.getInterpolationModel(other, "Iacute", None, otherIndex)
+    assert recompiled is not model
+    for location in locations:
+        coordinates = service.makeInstance(recompiled, location)
+        assertPensEqual(recompiled.makePen(coordinates), makeOutlinePen(other.makeOneGlyph("Iacute", location=location)))
+
+def test_modelDiskCacheIgnoresCorruptFiles(operator, tmp_path):
+    axisExtremes = SourceLocationIndex(operator).getAxisExtremes()
+    cache = ModelDiskCache(str(tmp_path / "models"))
+    key = cache.makeKey(operator, "I", None, axisExtremes)
+    os.makedirs(cache.directory)
+    with open(os.path.join(cache.directory, key + cache.suffix), "wb") as f:
+        f.write(b"LBM1 not a model")
+    assert cache.get(key, axisExtremes) is None
+
+
+# the shared caches
+
+def test_closedOperatorIsForgotten(operator, designspacePath):
+    service = InterpolationService()
+    other = UFOOperator(designspacePath)
+    key = service.cache.makeKey("model", operator, "O")
+    otherKey = service.cache.makeKey("model", other, "O")
+    service.cache.set(key, "closed")
+    service.cache.set(otherKey, "open")
+    holder = object()
+    service.get(holder, service.cache.makeKey("preview", operator, "O", location=locations[1]), lambda: "preview")
+    service.operatorClosed(operator)
+    assert service.cache.get(key) is None
+    assert service.cache.get(otherKey) == "open"
+    assert service.get(holder, service.cache.makeKey("preview", operator, "O", location=locations[1])) is None
+
+
+# layers
+
+def test_batchedLayers():
+    container = CountingContainer()
+    pool = SublayerPool(container)
+    vectors = [((i, 0), (i, 100)) for i in range(100)]
+    for redraw in range(3):
+        pool.begin()
+        appendVectorsLayer(pool, vectors, strokeColor=(0, 0, 1, 1), strokeDash=(5, 5))
+        appendMarkersLayer(pool, [b for a, b in vectors], size=5, fillColor=(0, 0, 1, 1))
+        pool.end()
+        # one layer for all vectors and one for all markers, made once
+        assert container.layerCount == 2
+        assert sum(pool.used.values()) == 2
+
+
+def test_previewRendererRedrawsChangedNodes(operator):
+    # the render nodes that do not depend on the preview location are left alone
+    service = InterpolationService()
+    container = CountingContainer()
+    renderer = PreviewRenderer(service, {name: SublayerPool(container) for name in renderPoolNames})
+    service.register(renderer)
+    index = SourceLocationIndex(operator)
+    editorGlyph = operator.findDefaultFont()["O"]
+    beams = [((-100, 350), (800, 350))]
+    request = renderer.render(operator, index, editorGlyph, locations[1], beams)
+    assert set(request['dirty']) == set(renderer.nodes)
+    assert request['visible'] == set(renderer.nodes) - {"previewLine"}
+    layerCount = container.layerCount
+    assert renderer.render(operator, index, editorGlyph, locations[1], beams)['dirty'] == []
+    request = renderer.render(operator, index, editorGlyph, locations[2], beams)
+    assert set(request['dirty']) == {"preview", "previewMarkers", "measurements"}
+    assert container.layerCount == layerCount
+    # while dragging the measurements are hidden
+    request = renderer.render(operator, index, editorGlyph, locations[3], beams, reducingDetail=True)
+    assert "measurements" in request['dirty'] and "measurements" not in request['visible']
+    service.unregister(renderer)
+
+
+# timing
+
+def test_pipelineTimerAcrossThreads(tmp_path):
+    # spans recorded on the render thread while the panel reads the summary
+    timer = PipelineTimer(maxEvents=500)
+    timer.enabled = True
+    done = threading.Event()
+    def record():
+        while not done.is_set():
+            with timer.span("computeRender"):
+                pass
+            timer.count("layers", 3)
+    # switch threads often so they meet in the middle of a summary
+    switchInterval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=record)
+    thread.start()
+    try:
+        for i in range(1000):
+            timer.summaryText()
+            if i % 100 == 0:
+                timer.writeChromeTrace(str(tmp_path / "trace.json"))
+                timer.clear()
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(switchInterval)
+    timer.clear()
+    with timer.span("computeRender"):
+        pass
+    spans, counters = timer.summary()
+    assert spans["computeRender"][0] == 1
+    assert counters == {}